@@ -0,0 +1,73 @@
+# adaptive.py
+import cv2
+from crop_engine import compose_affine, translation
+
+# Adaptive mode OCRs every crop with the cheapest pre-processing first and only
+# escalates to the more expensive steps when Tesseract's word confidences show
+# that the cheap result is unreliable. Each path is the list of steps applied
+# to the crop, in order (see run_ocr._recognize_adaptive).
+CASCADE = (
+    ('raw',),
+    ('binarize',),
+    ('rescale', 'binarize'),
+    ('rotate', 'rescale', 'binarize'),
+)
+# Mean word confidence (0-100) at which a path's result is accepted.
+DEFAULT_CONFIDENCE_THRESHOLD = 75
+# Context added around the box, as a fraction of its size, before estimating its skew.
+ROTATE_MARGIN = 0.25
+# Skew angles below this (in degrees) are left alone.
+MIN_ROTATION = 0.5
+
+
+def mean_confidence(words):
+    """Returns the mean confidence of the recognized words, or 0 if there are none."""
+    confidences = [word['conf'] for word in words if word['conf'] >= 0]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+def words_to_text(words):
+    """Joins recognized words into text: spaces within a line, newlines between lines."""
+    lines = {}
+    for word in words:
+        lines.setdefault(word['line'], []).append(word['text'])
+    return '\n'.join(' '.join(line) for line in lines.values())
+
+
+def rotated_recrop(engine, pixel_box, rotation=0):
+    """
+    Re-crops a box after straightening it. The skew is estimated from the dark
+    pixels of the box plus ROTATE_MARGIN of context, and the box is sampled
+    again rotated around its center, so the corners of tilted text that fell
+    outside the original box come back in. `engine` is the image's
+    crop_engine.CropEngine and `pixel_box` the box's pixel (x, y, w, h), as
+    from CropEngine.pixel_boxes. Returns the plain crop when no meaningful skew
+    is found.
+    """
+    box_map, (w, h), _ = engine.pixel_box_map(pixel_box, rotation)
+    margin_x, margin_y = int(w * ROTATE_MARGIN), int(h * ROTATE_MARGIN)
+    region_map = compose_affine(box_map, translation(-margin_x, -margin_y))
+    region = engine.warp(region_map, w + 2 * margin_x, h + 2 * margin_y)
+    if region.size == 0:
+        return region
+
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(mask)
+    if points is None or len(points) < 10:
+        return engine.crop_pixels(pixel_box, rotation)[0]
+
+    angle = cv2.minAreaRect(points)[-1]
+    # minAreaRect reports the angle of an arbitrary rectangle side; fold it into [-45, 45].
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < MIN_ROTATION:
+        return engine.crop_pixels(pixel_box, rotation)[0]
+
+    # Rotate the region around the box center, then take the box out of it again.
+    rotation = cv2.getRotationMatrix2D((margin_x + w / 2, margin_y + h / 2), angle, 1.0)
+    crop_map = compose_affine(region_map, compose_affine(cv2.invertAffineTransform(rotation),
+                                                         translation(margin_x, margin_y)))
+    return engine.warp(crop_map, w, h)
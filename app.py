@@ -1,20 +1,39 @@
 # app.py
 import os
 import pandas as pd
-from flask import Flask, request, render_template, redirect, url_for, flash, session, send_from_directory
+from flask import Flask, request, render_template, redirect, url_for, flash, session, send_from_directory, send_file, jsonify, Response
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 import json
+import uuid
 from datetime import datetime
 
 # Import the functions from your existing scripts
 from parse_label_studio import parse_label_studio_export
-from run_ocr import run_ocr_on_boxes
-from evaluate import evaluate_tesseract_performance
+from run_ocr import iter_ocr_results, OCR_MODES
+from evaluate import EvaluationAccumulator
+from ocr_cache import OCRCache
+from jobs import JobManager, JobQueueFullError
+from profiling import RunProfiler
+from result_store import ResultStore, MAX_PAGE_SIZE
+from previews import PreviewStore, PREVIEW_MAX_AGE
+from preprocessing import DEFAULT_ORDER, PreprocessingPipeline
 
 # --- Flask App Configuration ---
 UPLOAD_FOLDER = 'uploads'
 REPORTS_FOLDER = 'reports'
+OCR_CACHE_FOLDER = '.ocr_cache'
 ALLOWED_JSON_EXTENSIONS = {'json'}
+# Upper bound for the number of OCR worker processes a single evaluation may request.
+MAX_OCR_WORKERS = os.cpu_count() or 1
+# Evaluations run in the background; this many at once, with at most MAX_PENDING_JOBS queued or running.
+JOB_WORKERS = 2
+MAX_PENDING_JOBS = 8
+# Orders of the rescale/binarize steps offered by the form.
+PREPROCESSING_ORDERS = {
+    'rescale_binarize': ('rescale', 'binarize'),
+    'binarize_rescale': ('binarize', 'rescale'),
+}
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -25,9 +44,102 @@ app.secret_key = 'super-secret-key'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(REPORTS_FOLDER, exist_ok=True)
 
+job_manager = JobManager(REPORTS_FOLDER, max_workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS)
+# Stage timings of every evaluation finished since the server started, served at /metrics.
+app_profiler = RunProfiler()
+# Per-image and per-box results of every evaluation, served page by page to the results page.
+result_store = ResultStore(os.path.join(REPORTS_FOLDER, 'results.sqlite3'))
+# Thumbnails and box crops of every evaluation, rendered once and served with caching headers.
+preview_store = PreviewStore(os.path.join(REPORTS_FOLDER, 'previews'))
+
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def run_evaluation_job(job):
+    """
+    Background job body: parses, OCRs and evaluates one submission while
+    updating the job's progress counters. Every image is scored and written to
+    the result store as soon as its OCR finishes; the returned job result only
+    holds the aggregate and the run profile. Previews for the results viewer
+    are rendered when they are first requested (see _send_preview).
+    """
+    params = job.params
+    profiler = RunProfiler()
+
+    with profiler.stage('parse'):
+        ground_truth_data = parse_label_studio_export(params['json_path'])
+    if not ground_truth_data:
+        raise ValueError('Could not parse ground truth data from JSON file.')
+    job.images_total = len(ground_truth_data)
+    job.boxes_total = sum(len(data['boxes']) for data in ground_truth_data.values())
+
+    ocr_cache = OCRCache(OCR_CACHE_FOLDER) if params['use_ocr_cache'] else None
+    records = ((filename, data['boxes']) for filename, data in ground_truth_data.items())
+    accumulator = EvaluationAccumulator()
+    try:
+        for filename, boxes in iter_ocr_results(
+            params['image_folder_path'],
+            records,
+            psm=7,
+            apply_rescaling=params['apply_rescaling'],
+            apply_binarization=params['apply_binarization'],
+            apply_deskew=params['apply_deskew'],
+            workers=params['workers'],
+            cache=ocr_cache,
+            profiler=profiler,
+            ocr_mode=params.get('ocr_mode', 'per_crop'),
+            preprocessing_order=params.get('preprocessing_order', DEFAULT_ORDER),
+            grayscale_first=params.get('grayscale_first', False)
+        ):
+            with profiler.stage('evaluate', filename):
+                row, _ = accumulator.add(filename, boxes)
+                result_store.add_image(job.id, row, boxes)
+            job.images_done += 1
+            job.boxes_done += len(boxes)
+
+        evaluation_df = accumulator.report()
+        if evaluation_df.empty:
+            raise ValueError('OCR processing returned no results.')
+        # Round-trip through pandas' JSON writer so numpy scalars become plain numbers.
+        aggregate = json.loads(evaluation_df.iloc[[-1]].to_json(orient='records'))[0]
+        result_store.finish_run(job.id, aggregate)
+    except Exception:
+        result_store.delete_run(job.id)
+        preview_store.delete_run(job.id)
+        raise
+    finally:
+        if ocr_cache is not None:
+            ocr_cache.close()
+
+    app_profiler.merge(profiler.snapshot())
+    return {
+        'aggregate_results': aggregate,
+        'profile': profiler.to_dict(),
+    }
+
+def render_previews(job_id, params, filename, boxes):
+    """Renders the thumbnail and box crops of one image of a job. Returns False if the image cannot be read."""
+    image_path = safe_join(params['image_folder_path'], filename)
+    if image_path is None:
+        return False
+    # Jobs saved before the pre-processing order existed ran rescale then binarize, in colour.
+    preprocessing = PreprocessingPipeline.from_flags(params['apply_rescaling'], params['apply_binarization'],
+                                                     order=params.get('preprocessing_order', DEFAULT_ORDER),
+                                                     grayscale_first=params.get('grayscale_first', False))
+    return preview_store.render_image(job_id, image_path, filename, boxes, preprocessing=preprocessing,
+                                      apply_deskew=params['apply_deskew'])
+
+def import_legacy_result(job):
+    """
+    Moves the results of a job saved before the result store existed (which kept
+    every row and box in the job file) into the store.
+    """
+    result = job.result
+    boxes_by_image = result.get('processed_data', {})
+    for row in result.get('detailed_results', []):
+        result_store.add_image(job.id, row, boxes_by_image.get(row['Image Filename'], {}).get('boxes', []))
+    result_store.finish_run(job.id, result['aggregate_results'])
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
@@ -42,55 +154,184 @@ def index():
         apply_rescaling = 'apply_rescaling' in request.form
         apply_binarization = 'apply_binarization' in request.form
         apply_deskew = 'apply_deskew' in request.form
+        use_ocr_cache = 'use_ocr_cache' in request.form
+        grayscale_first = 'grayscale_first' in request.form
+        preprocessing_order = PREPROCESSING_ORDERS.get(request.form.get('preprocessing_order'), DEFAULT_ORDER)
+        ocr_mode = request.form.get('ocr_mode', 'per_crop')
+        if ocr_mode not in OCR_MODES:
+            ocr_mode = 'per_crop'
+
+        # Number of OCR worker processes, clamped to the cores available on this machine.
+        try:
+            workers = int(request.form.get('workers', 1))
+        except ValueError:
+            workers = 1
+        workers = max(1, min(workers, MAX_OCR_WORKERS))
 
         if json_file.filename == '' or not image_folder_path or not os.path.isdir(image_folder_path):
             flash('Error: Please provide a valid JSON file and a valid directory path.', 'danger')
             return redirect(request.url)
 
         if json_file and allowed_file(json_file.filename, ALLOWED_JSON_EXTENSIONS):
-            json_filename = secure_filename(json_file.filename)
+            # Prefix uploads with a unique id so concurrent submissions never overwrite each other.
+            json_filename = f"{uuid.uuid4().hex[:8]}-{secure_filename(json_file.filename)}"
             json_path = os.path.join(app.config['UPLOAD_FOLDER'], json_filename)
             json_file.save(json_path)
 
-            # Store image directory in session for the /images/<path> route to work
-            session['image_dir'] = image_folder_path
-            
-            # --- CONSOLIDATED BACKEND PROCESSING ---
-            ground_truth_data = parse_label_studio_export(json_path)
-            if not ground_truth_data:
-                flash('Error: Could not parse ground truth data from JSON file.', 'danger')
-                return redirect(url_for('index'))
-
-            processed_data = run_ocr_on_boxes(
-                image_folder_path, 
-                ground_truth_data, 
-                psm=7,
-                apply_rescaling=apply_rescaling,
-                apply_binarization=apply_binarization,
-                apply_deskew=apply_deskew
-            )
-            if not processed_data:
-                flash('Error: OCR processing returned no results.', 'danger')
-                return redirect(url_for('index'))
-
-            evaluation_df = evaluate_tesseract_performance(processed_data)
-            if evaluation_df.empty:
-                flash('Error: Evaluation produced no results.', 'danger')
+            params = {
+                'json_path': json_path,
+                'json_filename': json_file.filename,
+                'image_folder_path': image_folder_path,
+                'apply_rescaling': apply_rescaling,
+                'apply_binarization': apply_binarization,
+                'apply_deskew': apply_deskew,
+                'preprocessing_order': list(preprocessing_order),
+                'grayscale_first': grayscale_first,
+                'use_ocr_cache': use_ocr_cache,
+                'ocr_mode': ocr_mode,
+                'workers': workers,
+            }
+            try:
+                job = job_manager.submit(run_evaluation_job, params)
+            except JobQueueFullError as e:
+                flash(f'Error: The evaluation queue is full ({e}) Please try again later.', 'danger')
                 return redirect(url_for('index'))
 
-            detailed_results = evaluation_df.iloc[:-1].to_dict(orient='records')
-            aggregate_results = evaluation_df.iloc[-1].to_dict()
-
-            # Directly render the results page with all the necessary data.
-            return render_template('results.html', 
-                                   detailed_results=detailed_results, 
-                                   aggregate_results=aggregate_results,
-                                   full_data_json=json.dumps(processed_data))
+            return redirect(url_for('job_progress', job_id=job.id))
         else:
             flash('Error: Invalid JSON file type.', 'danger')
             return redirect(request.url)
             
-    return render_template('index.html')
+    return render_template('index.html', max_workers=MAX_OCR_WORKERS,
+                           previous_jobs=job_manager.list_completed())
+
+# Progress page that polls the status endpoint until the job finishes
+@app.route('/jobs/<job_id>')
+def job_progress(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        flash('Error: Unknown evaluation job.', 'danger')
+        return redirect(url_for('index'))
+    return render_template('job.html', job=job.to_status())
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    return jsonify(job.to_status())
+
+@app.route('/jobs/<job_id>/profile')
+def job_profile(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    if job.status != 'finished' or not job.result.get('profile'):
+        return jsonify({'error': 'No profile available for this job.'}), 404
+    return jsonify(job.result['profile'])
+
+# Prometheus scrape endpoint with the stage timings of all finished evaluations
+@app.route('/metrics')
+def metrics():
+    return Response(app_profiler.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    job = job_manager.get(job_id)
+    if job is None or job.status != 'finished':
+        return redirect(url_for('job_progress', job_id=job_id))
+
+    if not result_store.has_run(job_id):
+        import_legacy_result(job)
+
+    # Store image directory in session for the /images/<path> route to work
+    session['image_dir'] = job.params['image_folder_path']
+    # The tables, charts and image viewer fetch their rows from the JSON endpoints below.
+    return render_template('results.html', job_id=job_id, max_page_size=MAX_PAGE_SIZE,
+                           aggregate_results=job.result['aggregate_results'])
+
+def _page_args():
+    """
+    Reads the paging and sorting arguments shared by the results endpoints.
+    Raises ValueError for invalid values.
+    """
+    args = request.args
+    limit = int(args.get('limit', 50))
+    offset = int(args.get('offset', 0))
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        raise ValueError(f'limit must be 1-{MAX_PAGE_SIZE} and offset at least 0.')
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'.")
+    minimums = {name: float(args[name]) if args.get(name) else None for name in ('min_wer', 'min_cer')}
+    return dict(sort=args.get('sort', 'filename'), descending=order == 'desc',
+                limit=limit, offset=offset, **minimums)
+
+# Sorted, filtered, paginated per-image results, e.g. ?sort=cer&order=desc&limit=50 for the 50 worst by CER
+@app.route('/jobs/<job_id>/images')
+def job_images(job_id):
+    if not result_store.has_run(job_id):
+        return jsonify({'error': 'No results for this job.'}), 404
+    try:
+        page = _page_args()
+        total, items = result_store.query_images(job_id, search=request.args.get('q'), **page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'total': total, 'offset': page['offset'], 'limit': page['limit'], 'items': items})
+
+# Sorted, filtered, paginated per-box results; ?filename=<image> returns the boxes of one image
+@app.route('/jobs/<job_id>/boxes')
+def job_boxes(job_id):
+    if not result_store.has_run(job_id):
+        return jsonify({'error': 'No results for this job.'}), 404
+    try:
+        page = _page_args()
+        total, items = result_store.query_boxes(job_id, filename=request.args.get('filename'), **page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'total': total, 'offset': page['offset'], 'limit': page['limit'], 'items': items})
+
+def _send_preview(job_id, filename, box_index=None):
+    """
+    Serves a preview of an image of a finished job, rendering all previews of
+    the image on its first request. Responses carry an ETag and a long
+    Cache-Control max-age, so the browser revalidates or reuses its copy.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    processed = request.args.get('processed') == '1'
+    path = preview_store.path(job_id, filename, box_index, processed=processed)
+    if not os.path.exists(path) and not preview_store.has_image(job_id, filename):
+        if not result_store.has_run(job_id):
+            return jsonify({'error': 'No results for this job.'}), 404
+        _, boxes = result_store.query_boxes(job_id, filename=filename, sort='box_index', limit=-1)
+        if not boxes:
+            return jsonify({'error': 'Image not found.'}), 404
+        try:
+            with app_profiler.stage('preview', filename):
+                rendered = render_previews(job_id, job.params, filename, boxes)
+        except Exception as e:
+            # A preview problem (e.g. a cv2.error on an odd crop) only affects this image's viewer.
+            print(f"Error rendering the previews of {filename} for job {job_id}: {e}")
+            return jsonify({'error': 'Could not render the previews of this image.'}), 500
+        if not rendered:
+            return jsonify({'error': 'Image not found.'}), 404
+    if not os.path.exists(path):
+        return jsonify({'error': 'No such box crop.'}), 404
+    response = send_file(path, max_age=PREVIEW_MAX_AGE, etag=True, conditional=True)
+    response.cache_control.immutable = True
+    return response
+
+# Downsized copy of an image for the modal viewer
+@app.route('/jobs/<job_id>/thumbnails/<path:filename>')
+def job_thumbnail(job_id, filename):
+    return _send_preview(job_id, filename)
+
+# The crop of one box as cut from the image; ?processed=1 returns it pre-processed as Tesseract saw it
+@app.route('/jobs/<job_id>/crops/<int:box_index>/<path:filename>')
+def job_crop(job_id, box_index, filename):
+    return _send_preview(job_id, filename, box_index)
 
 # Route to serve images for the modal viewer
 @app.route('/images/<path:filename>')
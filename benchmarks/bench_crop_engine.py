@@ -0,0 +1,119 @@
+# benchmarks/bench_crop_engine.py
+"""
+Compares crop extraction with deskewing enabled: the full-frame path
+(run_ocr.deskew_image on the whole image, then slicing every box) against
+crop_engine.CropEngine (skew estimated on a downsampled copy, only the box
+regions warped). Pages are synthetic scans with known text boxes and a random
+tilt. Also reports how far the engine's angle and crops are from the
+full-frame path, and checks rotated Label Studio boxes against their source.
+
+Usage:
+    python -m benchmarks.bench_crop_engine --pages 5 --width 2480 --height 3508
+"""
+import argparse
+import random
+import time
+import cv2
+import numpy as np
+from benchmarks.synthetic_data import render_page, render_text_line, random_text
+from crop_engine import CropEngine, estimate_skew
+from run_ocr import deskew_image, _box_to_pixels
+
+
+def full_frame_crops(image, coords_list):
+    """The pre-CropEngine path: deskew the whole frame, then slice each box."""
+    frame = deskew_image(image)
+    height, width = frame.shape[:2]
+    crops = []
+    for coords in coords_list:
+        x, y, w, h = _box_to_pixels(coords, width, height)
+        crops.append(frame[y:y+h, x:x+w])
+    return crops
+
+
+def engine_crops(image, coords_list, max_side):
+    engine = CropEngine(image, apply_deskew=True, max_side=max_side)
+    return [engine.crop(coords)[0] for coords in coords_list]
+
+
+def make_pages(count, width, height, boxes_per_page, max_skew, seed):
+    """Renders `count` tilted pages and returns [(image, [Label Studio coords])]."""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        page, boxes = render_page(rng, width, height, boxes_per_page, noise=0.0, max_skew=max_skew)
+        coords_list = [{'x': x * 100 / width, 'y': y * 100 / height,
+                        'width': w * 100 / width, 'height': h * 100 / height, 'rotation': 0}
+                       for _, x, y, w, h in boxes]
+        pages.append((page, coords_list))
+    return pages
+
+
+def check_rotated_boxes(count, seed):
+    """
+    Pastes text lines onto a page rotated clockwise around their top-left corner,
+    the way Label Studio stores rotated rectangles, and returns the mean absolute
+    pixel difference between each engine crop and the original line.
+    """
+    rng = random.Random(seed)
+    differences = []
+    for _ in range(count):
+        line = cv2.cvtColor(render_text_line(random_text(rng, 2, 4)), cv2.COLOR_BGR2GRAY)
+        h, w = line.shape
+        page_w, page_h = 1200, 900
+        x, y, rotation = rng.randint(200, 500), rng.randint(200, 500), rng.uniform(-40, 40)
+        theta = np.deg2rad(rotation)
+        # Crop pixel (u, v) lands on page point (x, y) + u * (cos, sin) + v * (-sin, cos).
+        box_map = np.array([[np.cos(theta), -np.sin(theta), x], [np.sin(theta), np.cos(theta), y]])
+        page = cv2.warpAffine(line, cv2.invertAffineTransform(box_map), (page_w, page_h),
+                              flags=cv2.INTER_CUBIC | cv2.WARP_INVERSE_MAP, borderValue=255)
+        coords = {'x': x * 100 / page_w, 'y': y * 100 / page_h,
+                  'width': w * 100 / page_w, 'height': h * 100 / page_h, 'rotation': rotation}
+        crop, _ = CropEngine(cv2.cvtColor(page, cv2.COLOR_GRAY2BGR)).crop(coords)
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        size = (min(h, crop.shape[0]), min(w, crop.shape[1]))
+        # Skip the outermost pixels, where interpolation meets the page border.
+        inner = (slice(2, size[0] - 2), slice(2, size[1] - 2))
+        differences.append(np.abs(crop[inner].astype(int) - line[inner].astype(int)).mean())
+    return float(np.mean(differences))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--width', type=int, default=2480, help='Page width in pixels (A4 at 300 DPI by default).')
+    parser.add_argument('--height', type=int, default=3508)
+    parser.add_argument('--boxes', type=int, default=40, help='Boxes per page.')
+    parser.add_argument('--max-skew', type=float, default=3.0)
+    parser.add_argument('--max-side', type=int, default=1024, help='Longest side used for skew estimation.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, args.width, args.height, args.boxes, args.max_skew, args.seed)
+    print(f"{args.pages} pages of {args.width}x{args.height} with {args.boxes} boxes each")
+
+    timings = {'full-frame': 0.0, 'crop engine': 0.0}
+    angle_errors, pixel_errors = [], []
+    for image, coords_list in pages:
+        start = time.perf_counter()
+        reference = full_frame_crops(image, coords_list)
+        timings['full-frame'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        crops = engine_crops(image, coords_list, args.max_side)
+        timings['crop engine'] += time.perf_counter() - start
+
+        angle_errors.append(abs(estimate_skew(image, args.max_side) - estimate_skew(image, None)))
+        pixel_errors += [np.abs(a.astype(int) - b.astype(int)).mean()
+                         for a, b in zip(reference, crops) if a.shape == b.shape and a.size]
+
+    for name, seconds in timings.items():
+        print(f"  {name:<12} {seconds / args.pages * 1000:8.1f} ms/page")
+    print(f"  speedup      {timings['full-frame'] / timings['crop engine']:8.1f}x")
+    print(f"  skew angle difference: mean {np.mean(angle_errors):.3f} deg, max {np.max(angle_errors):.3f} deg")
+    print(f"  crop difference vs full-frame: {np.mean(pixel_errors):.2f} mean absolute gray levels")
+    print(f"  rotated boxes vs source lines: {check_rotated_boxes(20, args.seed):.2f} mean absolute gray levels")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_dataset.py
+"""
+Compares the memory held by the nested box dicts of parse_label_studio_export
+with that of the compact array-backed dataset.CompactDataset on synthetic
+annotations (no images or Tesseract needed), with and without OCR results, and
+checks that the dict adapters round-trip exactly. Also compares what the OCR
+stage does with the coordinates: converting them to pixels box by box
+(CropEngine.box_map) against once per image (CropEngine.pixel_boxes), and the
+size of the process pool payload as coordinate dicts against array slices.
+
+Usage:
+    python -m benchmarks.bench_dataset --images 20000 --boxes 50
+"""
+import argparse
+import gc
+import pickle
+import random
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.synthetic_data import random_text
+from crop_engine import CropEngine
+from dataset import CompactDataset, coords_array
+
+
+def make_records(num_images, boxes_per_image, seed):
+    """Returns (filename, boxes) records shaped like iter_label_studio_export's output."""
+    rng = random.Random(seed)
+    records = []
+    for index in range(num_images):
+        boxes = []
+        for box_index in range(boxes_per_image):
+            boxes.append({
+                'id': f"{rng.getrandbits(40):010x}",
+                'coords': {'x': rng.uniform(0, 90), 'y': rng.uniform(0, 95), 'width': rng.uniform(2, 10),
+                           'height': rng.uniform(1, 5), 'rotation': 0},
+                'gt_text': random_text(rng, 1, 4),
+            })
+        records.append((f"page_{index:06d}.png", boxes))
+    return records
+
+
+def measure_allocation(build):
+    """Returns (object, bytes still allocated by building it)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated
+
+
+def add_ocr_texts(boxes_per_image, seed, store):
+    """Calls store(image index, [OCR text per box]) for every image with the same synthetic texts."""
+    rng = random.Random(seed)
+    def build(images):
+        for index in range(images):
+            store(index, [random_text(rng, 1, 4) for _ in range(boxes_per_image)])
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--boxes', type=int, default=50, help='Boxes per image.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=2480, help='Page width in pixels for the pixel conversion.')
+    parser.add_argument('--height', type=int, default=3508)
+    args = parser.parse_args()
+
+    records = make_records(args.images, args.boxes, args.seed)
+    total_boxes = args.images * args.boxes
+    print(f"{args.images} images, {total_boxes} boxes")
+
+    # Memory: the dicts are rebuilt from a pickle so both sides are measured from scratch.
+    serialized = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+    del records
+    dicts, dict_bytes = measure_allocation(lambda: {filename: {'boxes': boxes}
+                                                    for filename, boxes in pickle.loads(serialized)})
+    compact, compact_bytes = measure_allocation(
+        lambda: CompactDataset.from_records((filename, data['boxes']) for filename, data in dicts.items()))
+    print(f"  memory        dicts {dict_bytes / 2**20:8.1f} MB   compact {compact_bytes / 2**20:8.1f} MB"
+          f"   ({dict_bytes / compact_bytes:.1f}x smaller)")
+
+    round_trip = all(image.to_boxes() == [dict(box, coords=dict(box['coords'], rotation=0.0))
+                                          for box in dicts[image.filename]['boxes']]
+                     for image in compact)
+    arrays_match = all(np.array_equal(coords_array(dicts[image.filename]['boxes']), image.coords)
+                       for image in compact)
+    print(f"  dict adapters round-trip: {'yes' if round_trip and arrays_match else 'NO'}")
+
+    # OCR results: one more string per box on the dicts, one text column per image in the compact form.
+    filenames = list(dicts)
+    def store_dicts(index, texts):
+        for box, text in zip(dicts[filenames[index]]['boxes'], texts):
+            box['ocr_text'] = text
+    _, dict_ocr_bytes = measure_allocation(lambda: add_ocr_texts(args.boxes, args.seed, store_dicts)(args.images))
+    _, compact_ocr_bytes = measure_allocation(lambda: add_ocr_texts(args.boxes, args.seed, lambda index, texts: (
+        compact.images[index].set_ocr_results([{'ocr_text': text} for text in texts])))(args.images))
+    print(f"  OCR texts     dicts {dict_ocr_bytes / 2**20:8.1f} MB   compact {compact_ocr_bytes / 2**20:8.1f} MB"
+          f"   ({dict_ocr_bytes / compact_ocr_bytes:.1f}x smaller)")
+    results_match = all(image.to_boxes() == [dict(box, coords=dict(box['coords'], rotation=0.0))
+                                             for box in dicts[image.filename]['boxes']]
+                        for image in compact)
+    print(f"  OCR results round-trip: {'yes' if results_match else 'NO'}")
+
+    # Pixel conversion, as run_ocr._ocr_boxes needs it for every image.
+    engine = CropEngine(np.zeros((args.height, args.width, 3), dtype=np.uint8))
+    # With every box dict alive, collections triggered by the timed code would dominate both timings.
+    gc.disable()
+    start = time.perf_counter()
+    looped = [[engine.box_map(box['coords'])[2] for box in dicts[image.filename]['boxes']] for image in compact]
+    loop_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = [engine.pixel_boxes(image.coords).tolist() for image in compact]
+    vectorized_seconds = time.perf_counter() - start
+    gc.enable()
+    pixels_match = all([tuple(box) for box in boxes] == keys for boxes, keys in zip(vectorized, looped))
+    print(f"  pixel boxes   loop {loop_seconds * 1000:9.1f} ms   vectorized {vectorized_seconds * 1000:9.1f} ms"
+          f"   ({loop_seconds / vectorized_seconds:.1f}x faster, identical: {'yes' if pixels_match else 'NO'})")
+
+    # Process pool payload: what _iter_parallel pickles for every task.
+    dict_payload = sum(len(pickle.dumps([{'coords': box['coords']} for box in dicts[image.filename]['boxes']],
+                                        protocol=pickle.HIGHEST_PROTOCOL)) for image in compact)
+    array_payload = sum(len(pickle.dumps(image.coords, protocol=pickle.HIGHEST_PROTOCOL)) for image in compact)
+    print(f"  pool payload  dicts {dict_payload / 2**20:8.1f} MB   arrays  {array_payload / 2**20:8.1f} MB"
+          f"   ({dict_payload / array_payload:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_ocr_backends.py
+"""
+Compares OCR throughput (crops/second) between the available OCR backends on
+small rendered single-line crops, the same shape of input run_ocr_on_boxes
+sends with PSM 7.
+
+Usage:
+    python -m benchmarks.bench_ocr_backends --crops 200
+"""
+import argparse
+import random
+import time
+from benchmarks.synthetic_data import random_text, render_text_line
+from ocr_backends import available_backends, get_backend
+from run_ocr import binarize_image
+
+
+def make_line_crops(count, seed=0):
+    """Renders `count` binarized single-line text crops with known content."""
+    rng = random.Random(seed)
+    return [(text, binarize_image(render_text_line(text)))
+            for text in (random_text(rng) for _ in range(count))]
+
+
+def benchmark_backend(name, crops, lang='eng', oem=3, psm=7):
+    """Runs every crop through one backend and returns (crops/s, startup seconds)."""
+    start = time.perf_counter()
+    backend = get_backend(name, lang, oem, psm)
+    backend.image_to_string(crops[0][1])
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, crop in crops:
+        backend.image_to_string(crop)
+    elapsed = time.perf_counter() - start
+    return len(crops) / elapsed, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--crops', type=int, default=200, help='Number of crops to recognize per backend.')
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--oem', type=int, default=3)
+    parser.add_argument('--psm', type=int, default=7)
+    args = parser.parse_args()
+
+    crops = make_line_crops(args.crops)
+    print(f"Benchmarking {len(crops)} crops with --oem {args.oem} --psm {args.psm} ({args.lang})")
+
+    results = {}
+    for name in available_backends():
+        crops_per_second, startup = benchmark_backend(name, crops, args.lang, args.oem, args.psm)
+        results[name] = crops_per_second
+        print(f"  {name:<12} {crops_per_second:8.1f} crops/s   (first call {startup * 1000:.0f} ms)")
+
+    if len(results) > 1:
+        speedup = results['tesserocr'] / results['pytesseract']
+        print(f"  tesserocr is {speedup:.1f}x the throughput of pytesseract")
+
+
+if __name__ == '__main__':
+    main()
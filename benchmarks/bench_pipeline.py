@@ -0,0 +1,173 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end throughput benchmark on synthetic data. For each dataset size it
+generates rendered text images and a Label Studio export, then times the
+parse, OCR and evaluate stages and reports images/s, boxes/s and peak RSS.
+Every size runs in a fresh process so the peak RSS figures do not leak
+between sizes. Needs only a local Tesseract install.
+
+Usage:
+    python -m benchmarks.bench_pipeline --sizes 10 50 200 --output bench.json
+    python -m benchmarks.bench_pipeline --sizes 10 50 --compare bench.json
+    python -m benchmarks.bench_pipeline --sizes 10 50 --ocr-mode stitched --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+
+def peak_rss_mb(include_children=False):
+    """Returns the peak resident set size of this process (and optionally its children) in MB."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / unit
+
+
+def run_single_size(num_images, workers, backend, seed, ocr_mode='per_crop'):
+    """Generates a dataset of `num_images` images and times every pipeline stage on it."""
+    from benchmarks.synthetic_data import generate_dataset
+    from parse_label_studio import parse_label_studio_export
+    from run_ocr import run_ocr_on_boxes
+    from evaluate import evaluate_tesseract_performance
+
+    with tempfile.TemporaryDirectory(prefix='ocr-bench-') as tmp_dir:
+        start = time.perf_counter()
+        image_dir, export_path, total_boxes = generate_dataset(tmp_dir, num_images, seed=seed)
+        generate_time = time.perf_counter() - start
+
+        stages = {}
+        baseline_rss = peak_rss_mb()
+
+        start = time.perf_counter()
+        ground_truth_data = parse_label_studio_export(export_path)
+        stages['parse'] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+        start = time.perf_counter()
+        processed_data = run_ocr_on_boxes(image_dir, ground_truth_data, workers=workers, backend=backend,
+                                          ocr_mode=ocr_mode)
+        stages['ocr'] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(include_children=True)}
+
+        start = time.perf_counter()
+        evaluation_df = evaluate_tesseract_performance(processed_data)
+        stages['evaluate'] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+    for stage in stages.values():
+        stage['images_per_second'] = num_images / stage['seconds'] if stage['seconds'] else None
+        stage['boxes_per_second'] = total_boxes / stage['seconds'] if stage['seconds'] else None
+
+    total_seconds = sum(stage['seconds'] for stage in stages.values())
+    aggregate = evaluation_df.iloc[-1]
+    return {
+        'images': num_images,
+        'boxes': total_boxes,
+        'workers': workers,
+        'ocr_mode': ocr_mode,
+        'generate_seconds': generate_time,
+        'baseline_rss_mb': baseline_rss,
+        'stages': stages,
+        'total_seconds': total_seconds,
+        'images_per_second': num_images / total_seconds,
+        'boxes_per_second': total_boxes / total_seconds,
+        'wer': float(aggregate['WER (%)']),
+        'cer': float(aggregate['CER (%)']),
+    }
+
+
+def git_revision():
+    """Returns the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    """Prints one line per size and stage, with the change against a baseline run if given."""
+    baseline_by_size = {run['images']: run for run in baseline['runs']} if baseline else {}
+    print(f"\n{'images':>7} {'boxes':>6} {'stage':<9} {'seconds':>9} {'images/s':>9} {'boxes/s':>9} {'peak MB':>8}  change")
+    for run in results['runs']:
+        previous = baseline_by_size.get(run['images'])
+        for name, stage in run['stages'].items():
+            change = ''
+            if previous and name in previous['stages'] and previous['stages'][name]['seconds']:
+                ratio = stage['seconds'] / previous['stages'][name]['seconds']
+                change = f"{(ratio - 1) * 100:+.1f}% time"
+            peak = f"{stage['peak_rss_mb']:.0f}" if stage['peak_rss_mb'] is not None else '-'
+            print(f"{run['images']:>7} {run['boxes']:>6} {name:<9} {stage['seconds']:>9.3f} "
+                  f"{stage['images_per_second']:>9.1f} {stage['boxes_per_second']:>9.1f} {peak:>8}  {change}")
+        print(f"{run['images']:>7} {run['boxes']:>6} {'total':<9} {run['total_seconds']:>9.3f} "
+              f"{run['images_per_second']:>9.1f} {run['boxes_per_second']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200], help='Dataset sizes in images.')
+    parser.add_argument('--workers', type=int, default=1, help='OCR worker processes.')
+    parser.add_argument('--backend', default='auto', help="OCR backend ('auto', 'tesserocr', 'pytesseract').")
+    parser.add_argument('--ocr-mode', default='per_crop', help="OCR mode ('per_crop' or 'stitched').")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', help='A previous --output file to compare against.')
+    parser.add_argument('--single-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_size is not None:
+        # Child process mode: run one size and print the result as JSON on the last line.
+        result = run_single_size(args.single_size, args.workers, args.backend, args.seed, args.ocr_mode)
+        print(json.dumps(result))
+        return
+
+    runs = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} images...")
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'benchmarks.bench_pipeline', '--single-size', str(size),
+             '--workers', str(args.workers), '--backend', args.backend, '--seed', str(args.seed),
+             '--ocr-mode', args.ocr_mode],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), text=True
+        )
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {
+        'revision': git_revision(),
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'backend': args.backend,
+        'ocr_mode': args.ocr_mode,
+        'runs': runs,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparing against revision {baseline.get('revision')}")
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_prefetch.py
+"""
+Measures how much the prefetch pipeline of run_ocr.py (see prefetch.py) hides
+image read and decode time behind OCR. It generates a synthetic dataset and
+OCRs it in a single process with each prefetch depth, reporting the wall time,
+how long OCR waited for images and how long the I/O threads waited for OCR.
+`--read-latency-ms` adds a sleep to every image read to model slow or network
+storage. The OCR results of every depth must equal those of depth 0. Needs
+only a local Tesseract install.
+
+Usage:
+    python -m benchmarks.bench_prefetch --images 40 --depths 0 2 4 8 --read-latency-ms 30
+"""
+import argparse
+import copy
+import tempfile
+import time
+import run_ocr
+from benchmarks.synthetic_data import generate_dataset
+from parse_label_studio import parse_label_studio_export
+from profiling import RunProfiler
+
+
+def with_read_latency(load_image, seconds):
+    """Wraps run_ocr._load_image so every read first sleeps for `seconds`."""
+    def slow_load_image(*args, **kwargs):
+        time.sleep(seconds)
+        return load_image(*args, **kwargs)
+    return slow_load_image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 2, 4, 8], help='Prefetch queue depths.')
+    parser.add_argument('--io-threads', type=int, default=2)
+    parser.add_argument('--read-latency-ms', type=float, default=0.0, help='Simulated storage latency per image.')
+    parser.add_argument('--deskew', action='store_true', help='Also estimate the skew on the I/O threads.')
+    parser.add_argument('--backend', default='auto', help="OCR backend ('auto', 'tesserocr', 'pytesseract').")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.read_latency_ms:
+        run_ocr._load_image = with_read_latency(run_ocr._load_image, args.read_latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory(prefix='ocr-bench-') as tmp_dir:
+        image_dir, export_path, total_boxes = generate_dataset(tmp_dir, args.images, seed=args.seed)
+        ground_truth_data = parse_label_studio_export(export_path)
+        print(f"{args.images} images, {total_boxes} boxes, {args.read_latency_ms:g} ms read latency")
+
+        runs = []
+        for depth in args.depths:
+            profiler = RunProfiler()
+            start = time.perf_counter()
+            results = run_ocr.run_ocr_on_boxes(image_dir, copy.deepcopy(ground_truth_data), backend=args.backend,
+                                               apply_deskew=args.deskew, profiler=profiler,
+                                               prefetch_depth=depth, io_threads=args.io_threads)
+            runs.append((depth, time.perf_counter() - start, profiler.stages, results))
+
+    reference = runs[0][3]
+    print(f"\n{'depth':>5} {'seconds':>9} {'images/s':>9} {'wait img s':>11} {'wait ocr s':>11} {'speedup':>8}  same")
+    for depth, seconds, stages, results in runs:
+        wait_image = stages.get('wait_for_image', [0, 0.0])[1]
+        wait_ocr = stages.get('wait_for_ocr', [0, 0.0])[1]
+        print(f"{depth:>5} {seconds:>9.3f} {args.images / seconds:>9.1f} {wait_image:>11.3f} {wait_ocr:>11.3f} "
+              f"{runs[0][1] / seconds:>7.2f}x  {'yes' if results == reference else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
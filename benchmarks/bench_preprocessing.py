@@ -0,0 +1,95 @@
+# benchmarks/bench_preprocessing.py
+"""
+Measures the per-crop cost of the pre-processing chain on the box crops of
+synthetic pages (no Tesseract needed). It compares the previous chain
+(run_ocr.rescale_image then run_ocr.binarize_image, both on the colour crop)
+with preprocessing.PreprocessingPipeline, with and without grayscale-first
+conversion, buffer reuse and batching. It reports the best time per crop over
+`--repeat` rounds (each round runs every variant once, so machine noise hits
+them alike), and the share of output pixels that differ from the previous
+chain. It also checks that reused-buffer and batched results are identical to
+those of the plain pipeline.
+
+Usage:
+    python -m benchmarks.bench_preprocessing --pages 20 --boxes 40 --order rescale binarize
+"""
+import argparse
+import random
+import time
+import numpy as np
+from benchmarks.synthetic_data import render_page
+from preprocessing import PreprocessingPipeline
+from run_ocr import binarize_image, rescale_image
+
+
+def make_crops(num_pages, boxes_per_page, seed):
+    """Returns the box crops of `num_pages` rendered A4 pages at 200 DPI."""
+    rng = random.Random(seed)
+    crops = []
+    for _ in range(num_pages):
+        page, boxes = render_page(rng, 1654, 2339, boxes_per_page, noise=0.02, max_skew=1.0)
+        crops += [page[y:y + h, x:x + w] for _, x, y, w, h in boxes]
+    return crops
+
+
+def previous_chain(crop, order):
+    for step in order:
+        crop = rescale_image(crop) if step == 'rescale' else binarize_image(crop)
+    return crop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--boxes', type=int, default=40, help='Text lines per page.')
+    parser.add_argument('--order', nargs='+', default=['rescale', 'binarize'], help='Enabled steps, in order.')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    crops = make_crops(args.pages, args.boxes, args.seed)
+    print(f"{len(crops)} crops, mean {np.mean([c.shape[0] for c in crops]):.0f}x"
+          f"{np.mean([c.shape[1] for c in crops]):.0f} px, steps {' -> '.join(args.order)}")
+    reference = [previous_chain(crop, args.order) for crop in crops]
+
+    variants = [('previous chain', None)]
+    for grayscale_first in (False, True):
+        for reuse_buffers in (False, True):
+            for batch in (False, True):
+                variants.append((
+                    f"gray first {'on ' if grayscale_first else 'off'}, reuse {'on ' if reuse_buffers else 'off'}, "
+                    f"batch {'on' if batch else 'off'}",
+                    PreprocessingPipeline(args.order, grayscale_first=grayscale_first,
+                                          reuse_buffers=reuse_buffers, batch=batch)))
+
+    def run(pipeline):
+        if pipeline is None:
+            return [previous_chain(crop, args.order) for crop in crops]
+        if pipeline.batch:
+            # One image's crops per call, as run_ocr._ocr_boxes does.
+            return [out for start in range(0, len(crops), args.boxes)
+                    for out in pipeline.process_batch(crops[start:start + args.boxes])]
+        return [pipeline(crop) for crop in crops]
+
+    best = [float('inf')] * len(variants)
+    for _ in range(args.repeat):
+        for index, (_, pipeline) in enumerate(variants):
+            start = time.perf_counter()
+            run(pipeline)
+            best[index] = min(best[index], time.perf_counter() - start)
+
+    print(f"\n{'variant':<40} {'us/crop':>9} {'speedup':>8} {'pixels differing':>17}")
+    for (name, pipeline), seconds in zip(variants, best):
+        results = run(pipeline)
+        if pipeline is not None and (pipeline.batch or pipeline.pool is not None):
+            plain = PreprocessingPipeline(args.order, grayscale_first='grayscale' in pipeline.steps)
+            if not all(np.array_equal(a, plain(crop)) for a, crop in zip(results, crops)):
+                print(f"  {name}: results differ from the plain pipeline!")
+        differing = sum(int(np.count_nonzero(a != b)) for a, b in zip(results, reference))
+        total = sum(b.size for b in reference)
+        print(f"{name:<40} {seconds / len(crops) * 1e6:>9.1f} {best[0] / seconds:>7.2f}x "
+              f"{differing / total * 100:>16.3f}%")
+
+
+if __name__ == '__main__':
+    main()
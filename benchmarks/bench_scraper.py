@@ -0,0 +1,145 @@
+# benchmarks/bench_scraper.py
+"""
+Times web_scraper against a local stand-in for books.toscrape.com that serves
+the same catalogue/book page structure and synthetic cover images, with an
+artificial per-request latency. The stand-in supports ETag, If-None-Match,
+HEAD and Range requests, so a second run measures the skip path of a resumed
+scrape.
+
+Usage:
+    python -m benchmarks.bench_scraper --books 100 --latency 0.05 --workers 1 8
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+from benchmarks.synthetic_data import random_text, render_text_line
+from web_scraper import scrape_all_book_covers
+
+BOOKS_PER_PAGE = 20
+
+
+def build_site(num_books, seed=0):
+    """Returns {path: (content type, body)} for a catalogue of `num_books` books."""
+    rng = random.Random(seed)
+    site = {}
+    num_pages = (num_books + BOOKS_PER_PAGE - 1) // BOOKS_PER_PAGE
+    for page in range(1, num_pages + 1):
+        articles = []
+        for book in range((page - 1) * BOOKS_PER_PAGE + 1, min(page * BOOKS_PER_PAGE, num_books) + 1):
+            articles.append(f'<article class="product_pod"><h3><a href="../../book_{book}/index.html">'
+                            f'Book {book}</a></h3></article>')
+            site[f'/catalogue/book_{book}/index.html'] = ('text/html', (
+                f'<html><body><div class="item active"><img src="../../media/cover_{book}.png" '
+                f'alt="Book {book}"/></div></body></html>').encode())
+            ok, png = cv2.imencode('.png', render_text_line(random_text(rng)))
+            site[f'/media/cover_{book}.png'] = ('image/png', png.tobytes())
+        next_link = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < num_pages else ''
+        site[f'/catalogue/category/books_1/page-{page}.html'] = ('text/html', (
+            f'<html><body>{"".join(articles)}<ul class="pager">{next_link}</ul></body></html>').encode())
+    return site
+
+
+def make_handler(site, latency, stats):
+    """Builds a request handler serving `site` with `latency` seconds of delay per request."""
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _serve(self, send_body):
+            with stats['lock']:
+                stats['requests'] += 1
+            time.sleep(latency)
+            if self.path not in site:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            content_type, body = site[self.path]
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            status, start = 200, 0
+            range_header = self.headers.get('Range')
+            if range_header and self.headers.get('If-Range', etag) == etag:
+                start = int(range_header.split('=')[1].split('-')[0])
+                status = 206
+            payload = body[start:]
+
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('ETag', etag)
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+            self.end_headers()
+            if send_body:
+                self.wfile.write(payload)
+                with stats['lock']:
+                    stats['bytes'] += len(payload)
+
+        def do_GET(self):
+            self._serve(send_body=True)
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+    return StandInHandler
+
+
+def start_stand_in_server(num_books, latency, seed=0):
+    """Starts the stand-in site on a free local port. Returns (server, base_url, stats)."""
+    stats = {'requests': 0, 'bytes': 0, 'lock': threading.Lock()}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(build_site(num_books, seed), latency, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/catalogue/category/books_1/page-1.html'
+    return server, base_url, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=100, help='Number of books in the stand-in catalogue.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server delay per request in seconds.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help='Download thread counts to compare.')
+    parser.add_argument('--rate', type=float, default=0, help='Global request rate limit (0 disables it).')
+    args = parser.parse_args()
+
+    server, base_url, stats = start_stand_in_server(args.books, args.latency)
+    print(f"Stand-in catalogue with {args.books} books at {base_url} ({args.latency * 1000:.0f} ms per request)")
+    results = []
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory(prefix='scraper-bench-') as save_directory:
+                for run in ('cold', 'resumed'):
+                    stats['requests'] = stats['bytes'] = 0
+                    start = time.perf_counter()
+                    manifest = scrape_all_book_covers(base_url, save_directory, workers=workers,
+                                                      requests_per_second=args.rate)
+                    elapsed = time.perf_counter() - start
+                    files = len([name for name in os.listdir(save_directory) if name.endswith('.png')])
+                    results.append((workers, run, elapsed, stats['requests'], stats['bytes'], len(manifest), files))
+    finally:
+        server.shutdown()
+
+    print(f"\n{'workers':>7} {'run':<8} {'seconds':>8} {'books/s':>8} {'requests':>9} {'KB sent':>8} {'files':>6}")
+    for workers, run, elapsed, requests_made, bytes_sent, books, files in results:
+        print(f"{workers:>7} {run:<8} {elapsed:>8.2f} {books / elapsed:>8.1f} {requests_made:>9} "
+              f"{bytes_sent / 1024:>8.0f} {files:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_sharding.py
+"""
+Runs a sharded evaluation with local processes standing in for nodes. It
+generates a synthetic dataset and evaluates it once unsharded as a reference.
+Then it starts one `main.py --shard k/n` pipeline per shard at the same time and
+merges their result logs. The merged per-image table and corpus aggregate must
+match the reference exactly. The wall time of both runs is reported. Needs
+only a local Tesseract install.
+
+Usage:
+    python -m benchmarks.bench_sharding --images 40 --shards 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from result_log import merge_result_logs, shard_path
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_node(data_dir, shard, backend):
+    """Child process mode: runs main.py's pipeline for one shard of the dataset in `data_dir`."""
+    import main
+    main.IMAGE_DIR = os.path.join(data_dir, 'images')
+    main.GROUND_TRUTH_JSON = os.path.join(data_dir, 'export.json')
+    main.OCR_BACKEND = backend
+    main.WORKERS = 1
+    main.USE_OCR_CACHE = False
+    main.PROFILE_RUN = False
+    for name in ('OUTPUT_REPORT_CSV', 'OUTPUT_BOX_REPORT_CSV', 'OUTPUT_RESULTS_JSONL'):
+        setattr(main, name, os.path.join(data_dir, 'output', os.path.basename(getattr(main, name))))
+    main.run_evaluation_pipeline(shard=shard)
+
+
+def start_nodes(data_dir, shard_count, backend):
+    """Starts one child process per shard and returns them."""
+    return [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_sharding', '--node', f'{k}/{shard_count}',
+                              '--data', data_dir, '--backend', backend],
+                             cwd=REPO_DIR, stdout=subprocess.DEVNULL)
+            for k in range(1, shard_count + 1)]
+
+
+def wait_for(processes):
+    for process in processes:
+        if process.wait() != 0:
+            raise RuntimeError(f"Shard process {process.args} exited with {process.returncode}")
+
+
+def sorted_report(report):
+    """Per-image rows sorted by filename (shards finish in any order), then the aggregate row."""
+    images = report.iloc[:-1].sort_values('Image Filename').reset_index(drop=True)
+    return images, report.iloc[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--backend', default='auto', help="OCR backend ('auto', 'tesserocr', 'pytesseract').")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--node', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.node:
+        from result_log import parse_shard
+        run_node(args.data, parse_shard(args.node), args.backend)
+        return
+
+    from benchmarks.synthetic_data import generate_dataset
+    with tempfile.TemporaryDirectory(prefix='ocr-shards-') as data_dir:
+        _, _, total_boxes = generate_dataset(data_dir, args.images, seed=args.seed)
+        print(f"{args.images} images, {total_boxes} boxes, {args.shards} shards")
+        results_jsonl = os.path.join(data_dir, 'output', 'ocr_results.jsonl')
+
+        start = time.perf_counter()
+        wait_for(start_nodes(data_dir, 1, args.backend))
+        single_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        wait_for(start_nodes(data_dir, args.shards, args.backend))
+        sharded_seconds = time.perf_counter() - start
+
+        reference, _ = merge_result_logs([shard_path(results_jsonl, (1, 1))])
+        merged, _ = merge_result_logs([shard_path(results_jsonl, (k, args.shards))
+                                       for k in range(1, args.shards + 1)])
+        reference_images, reference_total = sorted_report(reference.report())
+        merged_images, merged_total = sorted_report(merged.report())
+
+    print(f"  1 process     {single_seconds:8.2f} s")
+    print(f"  {args.shards} processes   {sharded_seconds:8.2f} s  ({single_seconds / sharded_seconds:.1f}x)")
+    print(f"  merged aggregate: WER {merged_total['WER (%)']:.2f}%, CER {merged_total['CER (%)']:.2f}% "
+          f"(reference WER {reference_total['WER (%)']:.2f}%, CER {reference_total['CER (%)']:.2f}%)")
+    matches = merged_images.equals(reference_images) and merged_total.equals(reference_total)
+    print(f"  merged report matches the unsharded run: {'yes' if matches else 'NO'}")
+    if not matches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/synthetic_data.py
+"""
+Generates synthetic text images with known content and a matching Label Studio
+JSON export, so the whole pipeline can be benchmarked offline without the
+private evaluation images.
+"""
+import json
+import os
+import random
+import uuid
+import cv2
+import numpy as np
+
+WORDS = ['recipes', 'gluten', 'free', 'world', 'flavor', 'kitchen', 'classic',
+         'stories', 'history', 'guide', 'the', 'of', 'and', 'modern', 'garden',
+         'bestselling', 'author', 'edition', 'novel', 'secrets', 'ocean', 'night']
+
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX]
+
+
+def random_text(rng, min_words=1, max_words=5):
+    """Returns a random phrase of dictionary words, capitalized like a title."""
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).title()
+
+
+def render_text_line(text, font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.8, thickness=2, padding=8):
+    """Renders a single line of black text on a white BGR crop."""
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, thickness)
+    crop = np.full((text_h + baseline + 2 * padding, text_w + 2 * padding, 3), 255, dtype=np.uint8)
+    cv2.putText(crop, text, (padding, text_h + padding), font, scale, (0, 0, 0), thickness, cv2.LINE_AA)
+    return crop
+
+
+def render_page(rng, width, height, num_boxes, noise=0.0, max_skew=0.0):
+    """
+    Renders a page with `num_boxes` text lines stacked top to bottom.
+    Returns the BGR image and a list of (text, x, y, w, h) pixel boxes.
+    Noise adds gaussian pixel noise; skew rotates the whole page by up to
+    `max_skew` degrees, leaving the boxes slightly off like a tilted scan.
+    """
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    boxes = []
+    row_height = height // max(num_boxes, 1)
+    for index in range(num_boxes):
+        text = random_text(rng)
+        font = rng.choice(FONTS)
+        scale = rng.uniform(0.6, 1.2)
+        thickness = rng.choice([1, 2])
+        (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, thickness)
+        # Shrink lines that do not fit the page width or their row.
+        fit = min(1.0, (width - 20) / (text_w + 1), (row_height - 6) / (text_h + baseline + 1))
+        scale *= fit
+        (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, thickness)
+
+        x = rng.randint(5, max(5, width - text_w - 10))
+        y = index * row_height + rng.randint(2, max(2, row_height - text_h - baseline - 2))
+        cv2.putText(page, text, (x, y + text_h), font, scale, (0, 0, 0), thickness, cv2.LINE_AA)
+        boxes.append((text, max(x - 3, 0), max(y - 3, 0), text_w + 6, text_h + baseline + 6))
+
+    if max_skew:
+        angle = rng.uniform(-max_skew, max_skew)
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=(255, 255, 255))
+
+    if noise:
+        noise_rng = np.random.default_rng(rng.randint(0, 2**32 - 1))
+        page = np.clip(page + noise_rng.normal(0, noise * 255, page.shape), 0, 255).astype(np.uint8)
+
+    return page, boxes
+
+
+def _label_studio_task(task_id, file_upload, width, height, boxes):
+    """Builds one Label Studio task with linked rectangle and textarea results per box."""
+    results = []
+    for text, x, y, w, h in boxes:
+        region_id = uuid.uuid4().hex[:10]
+        value = {
+            'x': x * 100 / width,
+            'y': y * 100 / height,
+            'width': w * 100 / width,
+            'height': h * 100 / height,
+            'rotation': 0,
+        }
+        common = {'original_width': width, 'original_height': height, 'image_rotation': 0,
+                  'id': region_id, 'to_name': 'image', 'origin': 'manual'}
+        results.append(dict(common, value=value, from_name='bbox', type='rectangle'))
+        results.append(dict(common, value=dict(value, text=[text]), from_name='transcription', type='textarea'))
+
+    return {
+        'id': task_id,
+        'annotations': [{'id': task_id, 'result': results}],
+        'file_upload': file_upload,
+        'data': {'ocr': f'/data/upload/1/{file_upload}'},
+    }
+
+
+def generate_dataset(output_dir, num_images, min_boxes=3, max_boxes=12,
+                     width=800, height=1000, noise=0.02, max_skew=2.0, seed=0):
+    """
+    Writes `num_images` synthetic images to `<output_dir>/images` and a matching
+    Label Studio export to `<output_dir>/export.json`.
+    Returns (image_dir, export_path, total_boxes).
+    """
+    rng = random.Random(seed)
+    image_dir = os.path.join(output_dir, 'images')
+    os.makedirs(image_dir, exist_ok=True)
+
+    tasks = []
+    total_boxes = 0
+    for index in range(num_images):
+        filename = f"synthetic_{index:05d}.png"
+        num_boxes = rng.randint(min_boxes, max_boxes)
+        page, boxes = render_page(rng, width, height, num_boxes, noise=noise, max_skew=max_skew)
+        cv2.imwrite(os.path.join(image_dir, filename), page)
+        tasks.append(_label_studio_task(index + 1, f"{uuid.uuid4().hex[:8]}-{filename}", width, height, boxes))
+        total_boxes += len(boxes)
+
+    export_path = os.path.join(output_dir, 'export.json')
+    with open(export_path, 'w', encoding='utf-8') as f:
+        json.dump(tasks, f)
+    return image_dir, export_path, total_boxes
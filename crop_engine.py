@@ -0,0 +1,136 @@
+# crop_engine.py
+import math
+import cv2
+import numpy as np
+
+# Skew is estimated on a copy of the image downsampled so its longest side is at
+# most this many pixels. The angle of a page of text barely changes with scale,
+# while the cost of finding it drops with the square of the scale factor.
+SKEW_ESTIMATE_MAX_SIDE = 1024
+
+
+def compose_affine(outer, inner):
+    """Returns the 2x3 affine transform that applies `inner` first, then `outer`."""
+    return (np.vstack([outer, [0, 0, 1]]) @ np.vstack([inner, [0, 0, 1]]))[:2]
+
+
+def translation(dx, dy):
+    """Returns the 2x3 affine transform that shifts points by (dx, dy)."""
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy]])
+
+
+def estimate_skew(image, max_side=SKEW_ESTIMATE_MAX_SIDE):
+    """
+    Returns the rotation angle (in degrees) that run_ocr.deskew_image would apply
+    to `image`, estimated on a copy downsampled to at most `max_side` pixels on
+    its longest side. `max_side=None` uses the full resolution.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    # An integer factor keeps INTER_AREA on its fast block-averaging path.
+    factor = math.ceil(max(gray.shape) / max_side) if max_side else 1
+    if factor > 1:
+        gray = cv2.resize(gray, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+
+    points = cv2.findNonZero(cv2.bitwise_not(gray))
+    if points is None:
+        return 0.0
+    # deskew_image measures (row, column) points, so swap findNonZero's (x, y)
+    # to get the same angle convention.
+    points = np.ascontiguousarray(points.reshape(-1, 2)[:, ::-1], dtype=np.float32)
+    angle = cv2.minAreaRect(points)[-1]
+
+    if angle < -45:
+        return -(90 + angle)
+    return -angle
+
+
+class CropEngine:
+    """
+    Extracts box crops from one image without transforming the whole frame.
+
+    With `apply_deskew` the skew is estimated on a downsampled copy and each box
+    is cut out of the *virtual* deskewed frame by warping only its own pixels.
+    With `max_side=None` this gives the same crop as deskew_image followed by
+    slicing; the downsampled angle is off by a few hundredths of a degree,
+    which shifts the crops by a few gray levels on average. Label Studio
+    boxes with a `rotation` are extracted as upright crops of the rotated
+    rectangle. Upright boxes on an image that needs no deskewing are plain
+    slices with no copy at all.
+    """
+
+    def __init__(self, image, apply_deskew=False, max_side=SKEW_ESTIMATE_MAX_SIDE):
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.angle = estimate_skew(image, max_side) if apply_deskew else 0.0
+        # Maps deskewed frame coordinates back to image coordinates, or None when
+        # the frame is the image itself.
+        self.frame_to_image = None
+        if self.angle:
+            # Same rotation as deskew_image: about the integer image center.
+            rotation = cv2.getRotationMatrix2D((self.width // 2, self.height // 2), self.angle, 1.0)
+            self.frame_to_image = cv2.invertAffineTransform(rotation)
+
+    def pixel_boxes(self, coords):
+        """
+        Converts an (n, 5) array of Label Studio coordinates (see
+        dataset.COORD_FIELDS) into an (n, 4) int64 array of pixel (x, y, w, h),
+        in one vectorized step for all boxes of the image. Truncates like int(),
+        so the boxes are exactly those of box_map.
+        """
+        scale = np.array([self.width, self.height, self.width, self.height], dtype=np.float64)
+        return (coords[:, :4] * scale / 100).astype(np.int64)
+
+    def box_map(self, coords):
+        """
+        Converts Label Studio percentage coordinates into the 2x3 affine map from
+        crop pixels (u, v) to frame coordinates, plus the crop size and a box key
+        for the OCR cache (see pixel_box_map).
+        """
+        x = int(coords['x'] * self.width / 100)
+        y = int(coords['y'] * self.height / 100)
+        w = int(coords['width'] * self.width / 100)
+        h = int(coords['height'] * self.height / 100)
+        return self.pixel_box_map((x, y, w, h), coords.get('rotation') or 0)
+
+    def pixel_box_map(self, pixel_box, rotation=0):
+        """
+        Like box_map, for a box already converted to pixel (x, y, w, h), e.g. by
+        pixel_boxes. Label Studio rotates boxes clockwise around their top-left
+        corner; upright boxes are clipped to the frame like a slice.
+        """
+        x, y, w, h = (int(value) for value in pixel_box)
+        if rotation:
+            theta = np.deg2rad(rotation)
+            cos, sin = np.cos(theta), np.sin(theta)
+            box_map = np.array([[cos, -sin, x], [sin, cos, y]])
+            return box_map, (w, h), (x, y, w, h, rotation)
+
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, self.width), min(y + h, self.height)
+        box_map = np.array([[1.0, 0.0, left], [0.0, 1.0, top]])
+        return box_map, (right - left, bottom - top), (x, y, w, h)
+
+    def warp(self, box_map, width, height):
+        """Samples a width x height crop through `box_map` (crop pixels -> frame coordinates)."""
+        if width <= 0 or height <= 0:
+            return self.image[0:0, 0:0]
+        if self.frame_to_image is not None:
+            box_map = compose_affine(self.frame_to_image, box_map)
+        return cv2.warpAffine(self.image, box_map, (width, height),
+                              flags=cv2.INTER_CUBIC | cv2.WARP_INVERSE_MAP,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def crop(self, coords):
+        """Returns the crop for Label Studio `coords` and its box key for the OCR cache."""
+        return self._crop(*self.box_map(coords))
+
+    def crop_pixels(self, pixel_box, rotation=0):
+        """Returns the crop of a pixel (x, y, w, h) box and its box key for the OCR cache."""
+        return self._crop(*self.pixel_box_map(pixel_box, rotation))
+
+    def _crop(self, box_map, size, key):
+        width, height = size
+        if self.frame_to_image is None and len(key) == 4:
+            left, top = int(box_map[0, 2]), int(box_map[1, 2])
+            return self.image[top:top + max(height, 0), left:left + max(width, 0)], key
+        return self.warp(box_map, width, height), key
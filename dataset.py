@@ -0,0 +1,141 @@
+# dataset.py
+import sys
+import numpy as np
+from parse_label_studio import iter_label_studio_export
+
+# Column order of the coordinate arrays: Label Studio percentages and rotation in degrees.
+COORD_FIELDS = ('x', 'y', 'width', 'height', 'rotation')
+
+
+def coords_array(boxes):
+    """Packs the coords of a list of box dicts into an (n, 5) float64 array."""
+    array = np.zeros((len(boxes), len(COORD_FIELDS)), dtype=np.float64)
+    for row, box in enumerate(boxes):
+        coords = box['coords']
+        array[row] = (coords['x'], coords['y'], coords['width'], coords['height'], coords.get('rotation') or 0)
+    return array
+
+
+class TextColumn:
+    """
+    Immutable list of strings stored as one string plus an offsets array, so a
+    million short texts cost one object instead of a million.
+    """
+    __slots__ = ('blob', 'offsets')
+
+    def __init__(self, strings):
+        strings = [text or '' for text in strings]
+        self.blob = ''.join(strings)
+        self.offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in strings], out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        return (self.blob[start:end] for start, end in zip(offsets, offsets[1:]))
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.blob) + self.offsets.nbytes
+
+
+class ImageAnnotations:
+    """
+    The boxes of one image in columnar form: a coordinate array, text columns
+    for the region ids and ground truth and, once run_ocr.iter_ocr_results has
+    OCR'd it, a text column for the OCR text plus lists for any other OCR
+    fields (e.g. the adaptive mode's ocr_path). `from_boxes` and `to_boxes`
+    convert from and to the list of box dicts used by evaluate.py and the
+    templates.
+    """
+    __slots__ = ('filename', 'coords', 'box_ids', 'gt_text', 'ocr_text', 'ocr_fields')
+
+    def __init__(self, filename, coords, box_ids, gt_text):
+        self.filename = filename
+        self.coords = coords
+        self.box_ids = box_ids
+        self.gt_text = gt_text
+        self.ocr_text = None
+        self.ocr_fields = None
+
+    @classmethod
+    def from_boxes(cls, filename, boxes):
+        return cls(filename, coords_array(boxes), TextColumn(str(box.get('id') or '') for box in boxes),
+                   TextColumn(box['gt_text'] for box in boxes))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def set_ocr_results(self, results):
+        """Stores the per-box OCR fields (at least ocr_text) returned by the OCR stage, in box order."""
+        self.ocr_text = TextColumn(fields['ocr_text'] for fields in results)
+        names = sorted({name for fields in results for name in fields} - {'ocr_text'})
+        self.ocr_fields = {name: [fields.get(name) for fields in results] for name in names} or None
+
+    def to_boxes(self):
+        """Returns the boxes, with their OCR fields if any, as the list of dicts used by the rest of the pipeline."""
+        boxes = [{'id': box_id, 'coords': dict(zip(COORD_FIELDS, coords)), 'gt_text': gt_text}
+                 for box_id, coords, gt_text in zip(self.box_ids, self.coords.tolist(), self.gt_text)]
+        if self.ocr_text is not None:
+            for box, ocr_text in zip(boxes, self.ocr_text):
+                box['ocr_text'] = ocr_text
+        for name, values in (self.ocr_fields or {}).items():
+            for box, value in zip(boxes, values):
+                if value is not None:
+                    box[name] = value
+        return boxes
+
+    @property
+    def nbytes(self):
+        total = self.coords.nbytes + self.box_ids.nbytes + self.gt_text.nbytes
+        if self.ocr_text is not None:
+            total += self.ocr_text.nbytes
+        return total
+
+
+class CompactDataset:
+    """
+    Ground truth (and, once OCR'd, the OCR results) of a whole export as a
+    list of ImageAnnotations. Uses a small fraction of the memory of the nested
+    dicts returned by parse_label_studio_export. Iterating it yields the
+    ImageAnnotations, which run_ocr.iter_ocr_results accepts in place of box
+    dicts; `records()` adapts it back to the dict format, one image at a time.
+    """
+    __slots__ = ('images',)
+
+    def __init__(self, images=()):
+        self.images = list(images)
+
+    @classmethod
+    def from_records(cls, records):
+        """Builds the dataset from (filename, boxes) records, e.g. iter_label_studio_export."""
+        return cls(ImageAnnotations.from_boxes(filename, boxes) for filename, boxes in records)
+
+    @classmethod
+    def from_label_studio(cls, json_filepath):
+        """Streams a Label Studio export into a compact dataset; only one task is ever held as dicts."""
+        return cls.from_records(iter_label_studio_export(json_filepath))
+
+    def __len__(self):
+        return len(self.images)
+
+    def __iter__(self):
+        return iter(self.images)
+
+    @property
+    def box_count(self):
+        return sum(len(image) for image in self.images)
+
+    @property
+    def nbytes(self):
+        return sum(image.nbytes for image in self.images)
+
+    def records(self):
+        """Yields (filename, boxes) with freshly built box dicts."""
+        for image in self.images:
+            yield image.filename, image.to_boxes()
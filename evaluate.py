@@ -1,63 +1,200 @@
 # evaluate.py
-import jiwer
+import re
+import sys
+import unicodedata
 import pandas as pd
+from rapidfuzz.distance import Levenshtein
 
-def evaluate_tesseract_performance(processed_data):
+# Additive edit operation counts recorded for every aligned text pair.
+# Aggregate error rates are derived by summing these, so no text has to be
+# kept (or re-aligned) to score a whole corpus.
+COUNT_KEYS = (
+    'word_hits', 'word_substitutions', 'word_deletions', 'word_insertions',
+    'char_hits', 'char_substitutions', 'char_deletions', 'char_insertions',
+)
+
+_MULTIPLE_SPACES = re.compile(r"\s\s+")
+
+# Every unicode character whose category starts with 'P', as removed by jiwer.RemovePunctuation.
+_PUNCTUATION_TABLE = dict.fromkeys(
+    codepoint for codepoint in range(sys.maxunicode + 1)
+    if unicodedata.category(chr(codepoint)).startswith('P')
+)
+
+def transformation(text):
     """
-    Takes the fully processed data (with gt_text and ocr_text) and calculates
-    per-file and aggregate error rates.
+    Normalizes text for comparison. Equivalent to
+    jiwer.Compose([ToLowerCase(), RemoveMultipleSpaces(), RemovePunctuation(), Strip()]),
+    but removes punctuation in a single str.translate pass instead of one
+    str.replace per punctuation character.
     """
-    evaluation_results = []
-    
-    transformation = jiwer.Compose([
-        jiwer.ToLowerCase(),
-        jiwer.RemoveMultipleSpaces(),
-        jiwer.RemovePunctuation(),
-        jiwer.Strip()
-    ])
+    text = _MULTIPLE_SPACES.sub(' ', text.lower())
+    return text.translate(_PUNCTUATION_TABLE).strip()
 
-    all_gt_corpus = []
-    all_hyp_corpus = []
+def _opcode_counts(reference, hypothesis):
+    """Returns (hits, substitutions, deletions, insertions) for two token sequences."""
+    hits = substitutions = deletions = insertions = 0
+    for tag, i1, i2, j1, j2 in Levenshtein.opcodes(reference, hypothesis):
+        if tag == 'equal':
+            hits += i2 - i1
+        elif tag == 'replace':
+            substitutions += i2 - i1
+        elif tag == 'delete':
+            deletions += i2 - i1
+        else:
+            insertions += j2 - j1
+    return hits, substitutions, deletions, insertions
 
-    for filename, data in processed_data.items():
-        gt_full_text = " ".join([box['gt_text'] for box in data['boxes']])
-        ocr_full_text = " ".join([box['ocr_text'] for box in data['boxes']])
+def _split_words(text):
+    """Tokenizes text into words exactly like jiwer's default WER transform."""
+    return [word for word in _MULTIPLE_SPACES.sub(' ', text).strip().split(' ') if word]
+
+def align_counts(reference, hypothesis):
+    """
+    Aligns an already normalized reference/hypothesis pair once at word level and
+    once at character level, and returns the edit operation counts.
+    This is the same rapidfuzz alignment jiwer.process_words/process_characters
+    use, so the counts match jiwer exactly, without their per-call overhead.
+    """
+    word_counts = _opcode_counts(_split_words(reference), _split_words(hypothesis))
+    char_counts = _opcode_counts(reference.strip(), hypothesis.strip())
+    return dict(zip(COUNT_KEYS, word_counts + char_counts))
+
+def add_counts(total, counts):
+    """Adds `counts` into `total` in place and returns `total`."""
+    for key in COUNT_KEYS:
+        total[key] = total.get(key, 0) + counts[key]
+    return total
+
+def error_rates(counts):
+    """
+    Returns (WER, CER) as fractions from edit operation counts, using the same
+    definition as jiwer: errors divided by the reference length.
+    """
+    rates = []
+    for level in ('word', 'char'):
+        errors = counts[f'{level}_substitutions'] + counts[f'{level}_deletions'] + counts[f'{level}_insertions']
+        reference_length = counts[f'{level}_hits'] + counts[f'{level}_substitutions'] + counts[f'{level}_deletions']
+        rates.append(errors / reference_length if reference_length else float(errors))
+    return tuple(rates)
+
+def score_boxes(boxes):
+    """
+    Computes WER/CER for every box and stores them on the box dictionaries
+    as 'wer' and 'cer' (in percent), next to 'gt_text' and 'ocr_text'.
+    """
+    for box in boxes:
+        counts = align_counts(transformation(box['gt_text']), transformation(box['ocr_text']))
+        word_error_rate, char_error_rate = error_rates(counts)
+        box['wer'] = word_error_rate * 100
+        box['cer'] = char_error_rate * 100
+
+class EvaluationAccumulator:
+    """
+    Scores images one at a time and keeps only the per-image rows and the
+    running edit operation counts. The aggregate WER/CER equal those of
+    jiwer.wer/jiwer.cer over the concatenated corpus, without keeping the corpus in memory.
+    """
+
+    def __init__(self, include_box_metrics=True):
+        self.include_box_metrics = include_box_metrics
+        self.rows = []
+        self.totals = dict.fromkeys(COUNT_KEYS, 0)
+
+    def add(self, filename, boxes):
+        """Scores one image and returns its row and edit operation counts."""
+        gt_full_text = " ".join([box['gt_text'] for box in boxes])
+        ocr_full_text = " ".join([box['ocr_text'] for box in boxes])
 
         # Apply transformations for consistent comparison
         transformed_gt = transformation(gt_full_text)
         transformed_hyp = transformation(ocr_full_text)
 
-        all_gt_corpus.append(transformed_gt)
-        all_hyp_corpus.append(transformed_hyp)
-
-        word_error_rate = jiwer.wer(transformed_gt, transformed_hyp)
-        char_error_rate = jiwer.cer(transformed_gt, transformed_hyp)
+        counts = align_counts(transformed_gt, transformed_hyp)
+        word_error_rate, char_error_rate = error_rates(counts)
 
-        evaluation_results.append({
+        row = {
             'Image Filename': filename,
             'Word Count (GT)': len(transformed_gt.split()),
             'Character Count (GT)': len(transformed_gt),
             'WER (%)': word_error_rate * 100,
             'CER (%)': char_error_rate * 100,
+        }
+        if self.include_box_metrics:
+            score_boxes(boxes)
+
+        self.add_row(row, counts)
+        return row, counts
+
+    def add_row(self, row, counts):
+        """Adds an already scored image, e.g. one restored from a previous run."""
+        self.rows.append(row)
+        add_counts(self.totals, counts)
+
+    def report(self):
+        """Returns the per-image rows followed by the aggregate row, or an empty DataFrame."""
+        if not self.rows:
+            return pd.DataFrame()
+
+        results_df = pd.DataFrame(self.rows)
+        aggregate_wer, aggregate_cer = error_rates(self.totals)
+
+        summary = {
+            'Image Filename': '--- AGGREGATE ---',
+            'Word Count (GT)': results_df['Word Count (GT)'].sum(),
+            'Character Count (GT)': results_df['Character Count (GT)'].sum(),
+            'WER (%)': aggregate_wer * 100,
+            'CER (%)': aggregate_cer * 100,
+        }
+
+        summary_df = pd.DataFrame([summary])
+        return pd.concat([results_df, summary_df], ignore_index=True)
+
+def compare_reports(report_df, other_df, label):
+    """
+    Adds the WER and CER of `other_df`, a report on the same images made with
+    other settings, to `report_df` as '<label> WER (%)' and '<label> CER (%)'
+    columns. Rows are matched by filename; the aggregate rows match each other.
+    """
+    other = other_df[['Image Filename', 'WER (%)', 'CER (%)']].rename(
+        columns={'WER (%)': f'{label} WER (%)', 'CER (%)': f'{label} CER (%)'})
+    return report_df.merge(other, on='Image Filename', how='left')
+
+def evaluate_tesseract_performance(processed_data, include_box_metrics=True):
+    """
+    Takes the fully processed data (with gt_text and ocr_text) and calculates
+    per-file and aggregate error rates. Each file is aligned once; the aggregate
+    is derived from the summed edit operation counts. With include_box_metrics,
+    every box also gets its own 'wer' and 'cer'.
+    """
+    accumulator = EvaluationAccumulator(include_box_metrics=include_box_metrics)
+    for filename, data in processed_data.items():
+        accumulator.add(filename, data['boxes'])
+    return accumulator.report()
+
+def box_rows(filename, boxes):
+    """Returns the per-box report rows of one image scored with include_box_metrics."""
+    rows = []
+    for index, box in enumerate(boxes):
+        if 'wer' not in box:
+            continue
+        rows.append({
+            'Image Filename': filename,
+            'Box Index': index,
+            'Ground Truth': box['gt_text'],
+            'OCR Text': box['ocr_text'],
+            'WER (%)': box['wer'],
+            'CER (%)': box['cer'],
         })
+        if 'ocr_path' in box:
+            # Recorded by the adaptive OCR mode.
+            rows[-1].update({'OCR Path': box['ocr_path'], 'OCR Confidence': box['ocr_confidence'],
+                             'OCR Attempts': box['ocr_attempts']})
+    return rows
 
-    if not evaluation_results:
-        return pd.DataFrame()
-
-    results_df = pd.DataFrame(evaluation_results)
-
-    aggregate_wer = jiwer.wer(all_gt_corpus, all_hyp_corpus) * 100
-    aggregate_cer = jiwer.cer(all_gt_corpus, all_hyp_corpus) * 100
-    
-    summary = {
-        'Image Filename': '--- AGGREGATE ---',
-        'Word Count (GT)': results_df['Word Count (GT)'].sum(),
-        'Character Count (GT)': results_df['Character Count (GT)'].sum(),
-        'WER (%)': aggregate_wer,
-        'CER (%)': aggregate_cer,
-    }
-
-    summary_df = pd.DataFrame([summary])
-    final_df = pd.concat([results_df, summary_df], ignore_index=True)
-    
-    return final_df
+def box_report(processed_data):
+    """Returns a per-box DataFrame for data scored with include_box_metrics."""
+    rows = []
+    for filename, data in processed_data.items():
+        rows.extend(box_rows(filename, data['boxes']))
+    return pd.DataFrame(rows)
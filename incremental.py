@@ -0,0 +1,96 @@
+# incremental.py
+import os
+from parse_label_studio import iter_label_studio_tasks, parse_task
+
+# What happens to an image in an incremental run, from cheapest to most expensive.
+REUSE, RESCORE, REOCR = 'reuse', 'rescore', 'reocr'
+# Box fields produced by the OCR stage, carried over when a box's OCR is reused.
+OCR_FIELDS = ('ocr_text', 'ocr_path', 'ocr_confidence', 'ocr_attempts')
+
+
+def image_signature(path):
+    """Returns [size, mtime_ns] of an image file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def iter_export_manifest(json_filepath):
+    """
+    Streams a Label Studio export like parse_label_studio.iter_label_studio_export,
+    but yields (filename, boxes, task) where `task` holds the task and
+    annotation ids recorded in the manifest.
+    """
+    for task in iter_label_studio_tasks(json_filepath):
+        record = parse_task(task)
+        if record is not None:
+            annotation = (task.get('annotations') or [{}])[0]
+            yield record[0], record[1], {'task_id': task.get('id'), 'annotation_id': annotation.get('id')}
+
+
+def _box_geometry(box):
+    coords = box['coords']
+    return (coords['x'], coords['y'], coords['width'], coords['height'], coords.get('rotation') or 0)
+
+
+def plan_image(previous, boxes, task, signature, whole_image=False):
+    """
+    Decides how much of an image must be redone, given its record from the
+    previous run's result log (None if it is new). Boxes whose geometry is
+    unchanged on an unchanged image file get their previous OCR copied in.
+
+    Returns (action, pending, changes): `action` is REUSE (row, counts and box
+    metrics are still valid), RESCORE (the OCR is reused but the ground truth
+    changed) or REOCR; `pending` lists the indexes of the boxes that need OCR;
+    `changes` counts boxes added, removed, moved and with edited text, matched
+    by their Label Studio region id within the same annotation. With
+    `whole_image` (stitched OCR, where every box affects the others) all boxes
+    of the image are re-OCR'd when the ordered list of box geometries differs
+    from the previous run, i.e. after a box was added, removed, moved or
+    reordered.
+    """
+    changes = dict.fromkeys(('added', 'removed', 'moved', 'edited'), 0)
+    if previous is None or previous.get('image') != signature:
+        changes['added'] = len(boxes) if previous is None else 0
+        return REOCR, list(range(len(boxes))), changes
+
+    # Region ids are only stable within one annotation; after a re-annotation
+    # boxes are matched by geometry alone. Logs of full runs carry no task ids.
+    previous_task = previous.get('task')
+    same_annotation = previous_task is None or previous_task.get('annotation_id') == task.get('annotation_id')
+    previous_by_id = {box.get('id'): box for box in previous['boxes']} if same_annotation else {}
+    previous_by_geometry = {}
+    for box in previous['boxes']:
+        previous_by_geometry.setdefault(_box_geometry(box), box)
+
+    pending = []
+    for index, box in enumerate(boxes):
+        match = previous_by_id.get(box.get('id'))
+        if match is not None:
+            if _box_geometry(match) != _box_geometry(box):
+                changes['moved'] += 1
+            elif match['gt_text'] != box['gt_text']:
+                changes['edited'] += 1
+        elif same_annotation:
+            changes['added'] += 1
+
+        reused = previous_by_geometry.get(_box_geometry(box))
+        if reused is None:
+            pending.append(index)
+        else:
+            box.update({field: reused[field] for field in OCR_FIELDS if field in reused})
+    if same_annotation:
+        current_ids = {box.get('id') for box in boxes}
+        changes['removed'] = sum(1 for box in previous['boxes'] if box.get('id') not in current_ids)
+
+    if whole_image and [_box_geometry(box) for box in boxes] != [_box_geometry(box) for box in previous['boxes']]:
+        # The canvases of the previous run held a different set of crops.
+        return REOCR, list(range(len(boxes))), changes
+    if pending:
+        return REOCR, pending, changes
+    previous_texts = [(box['gt_text'], box['ocr_text']) for box in previous['boxes']]
+    if previous_texts == [(box['gt_text'], box['ocr_text']) for box in boxes]:
+        return REUSE, [], changes
+    return RESCORE, [], changes
@@ -0,0 +1,167 @@
+# jobs.py
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """
+    A single evaluation run. The worker thread updates the progress counters
+    while request threads read them to report status.
+    """
+
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.images_total = 0
+        self.images_done = 0
+        self.boxes_total = 0
+        self.boxes_done = 0
+        self.error = None
+        self.result = None
+
+    def to_status(self):
+        """Returns a JSON-serializable progress report, including throughput and ETA."""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        boxes_per_second = self.boxes_done / elapsed if elapsed > 0 else 0.0
+        images_per_second = self.images_done / elapsed if elapsed > 0 else 0.0
+
+        eta_seconds = None
+        if self.status == 'running' and boxes_per_second > 0:
+            eta_seconds = max(self.boxes_total - self.boxes_done, 0) / boxes_per_second
+
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'images_done': self.images_done,
+            'images_total': self.images_total,
+            'boxes_done': self.boxes_done,
+            'boxes_total': self.boxes_total,
+            'elapsed_seconds': elapsed,
+            'images_per_second': images_per_second,
+            'boxes_per_second': boxes_per_second,
+            'eta_seconds': eta_seconds,
+            'error': self.error,
+            'created_at': self.created_at,
+        }
+
+    def to_record(self):
+        """Returns everything needed to reopen the job after a restart."""
+        record = self.to_status()
+        record.update(params=self.params, started_at=self.started_at,
+                      finished_at=self.finished_at, result=self.result)
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record['job_id'], record.get('params', {}))
+        job.status = record['status']
+        job.created_at = record.get('created_at', 0)
+        job.started_at = record.get('started_at')
+        job.finished_at = record.get('finished_at')
+        job.images_total = job.images_done = record.get('images_done', 0)
+        job.boxes_total = job.boxes_done = record.get('boxes_done', 0)
+        job.error = record.get('error')
+        job.result = record.get('result')
+        return job
+
+
+class JobManager:
+    """
+    Runs evaluation jobs on a bounded pool of local worker threads.
+    Finished jobs are written to `<reports_folder>/jobs/<job_id>.json` so their
+    results can be reopened later without recomputation.
+    """
+
+    def __init__(self, reports_folder, max_workers=2, max_pending=8):
+        self.jobs_folder = os.path.join(reports_folder, 'jobs')
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, target, params):
+        """
+        Queues `target(job)` and returns the new job immediately. The target
+        updates the job's progress counters and returns the result dictionary.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status in ('queued', 'running'))
+            if active >= self.max_pending:
+                raise JobQueueFullError(f"{active} evaluations are already queued or running.")
+            job = Job(uuid.uuid4().hex, params)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, target)
+        return job
+
+    def _run(self, job, target):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = target(job)
+            job.status = 'finished'
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._persist(job)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_folder, f"{job_id}.json")
+
+    def _persist(self, job):
+        path = self._job_path(job.id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job.to_record(), f)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id):
+        """Returns a job from memory, or reloads a persisted one. None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        # Job ids are hex strings; anything else cannot name a persisted job.
+        if not job_id.isalnum():
+            return None
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            job = Job.from_record(json.load(f))
+        with self._lock:
+            self._jobs.setdefault(job_id, job)
+        return job
+
+    def list_completed(self, limit=20):
+        """Returns the status of the most recent persisted jobs, newest first."""
+        statuses = []
+        for name in os.listdir(self.jobs_folder):
+            if not name.endswith('.json'):
+                continue
+            job = self.get(name[:-len('.json')])
+            if job is not None:
+                status = job.to_status()
+                status['params'] = job.params
+                statuses.append(status)
+        statuses.sort(key=lambda status: status['created_at'], reverse=True)
+        return statuses[:limit]
@@ -1,74 +1,510 @@
 # main.py
+import argparse
 import os
+import time
 import pandas as pd
-from parse_label_studio import parse_label_studio_export
-from run_ocr import batch_ocr_with_bounding_boxes
-from evaluate import evaluate_tesseract_performance
+from parse_label_studio import parse_label_studio_export, iter_label_studio_export
+from run_ocr import COMPARE_PREFIX, iter_ocr_results
+from preprocessing import PreprocessingPipeline
+from evaluate import EvaluationAccumulator, compare_reports
+from ocr_cache import OCRCache
+from sweep import expand_grid, run_parameter_sweep
+from profiling import RunProfiler, NULL_PROFILER
+from dataset import CompactDataset, ImageAnnotations
+from incremental import REUSE, RESCORE, REOCR, image_signature, iter_export_manifest, plan_image
+from result_log import (ResultLog, SettingsMismatchError, iter_merged_records, iter_result_log, merge_result_logs,
+                        parse_shard, read_log_header, shard_of, shard_path, write_box_report)
 
 # --- Configuration ---
 IMAGE_DIR = 'images'
 GROUND_TRUTH_JSON = os.path.join('ground_truth', 'project-1-at-2025-07-02-07-34-c2be24bf.json')
 OUTPUT_REPORT_CSV = os.path.join('output', 'ocr_evaluation_report.csv')
+OUTPUT_BOX_REPORT_CSV = os.path.join('output', 'ocr_box_report.csv')
+# Every image is appended here (report row, error counts, OCR text and per-box
+# metrics) as soon as it is evaluated, so an interrupted run can be continued
+# with `python main.py --resume`. The CSV reports are built from it at the end.
+# With `--shard k/n` every output file gets a `.shard-k-of-n` suffix, and
+# `--merge` combines the shard logs into the reports above. `--incremental` uses
+# the log as the manifest of the previous run and redoes only what changed.
+OUTPUT_RESULTS_JSONL = os.path.join('output', 'ocr_results.jsonl')
+# Stream the Label Studio export task by task instead of loading it all up front,
+# so OCR starts on the first task and the raw export is never held in memory.
+STREAM_GROUND_TRUTH = True
 
 # --- Tesseract Settings ---
 # For cropped regions, PSM 7 (single text line) or 6 (single block) is usually best.
 PSM_SETTING = 7
 OEM_SETTING = 3
+# OCR engine: 'tesserocr' (persistent engine), 'pytesseract' (one process per crop) or 'auto'.
+OCR_BACKEND = 'auto'
+# 'per_crop' runs Tesseract once per box. 'stitched' packs all boxes of an image into
+# one composite canvas and runs Tesseract once per image, which is much faster on
+# box-heavy images; compare the modes with --sweep before switching.
+# 'adaptive' OCRs each box with the cheapest pre-processing first and escalates
+# (binarize, rescale, rotated re-crop) only while Tesseract's mean word confidence
+# is below ADAPTIVE_CONFIDENCE_THRESHOLD; the path taken is in the per-box report.
+OCR_MODE = 'per_crop'
+ADAPTIVE_CONFIDENCE_THRESHOLD = 75
+# Also OCR every image in this mode (e.g. 'per_crop' while OCR_MODE is 'stitched') and
+# add its WER/CER next to OCR_MODE's in the evaluation report, to see what the faster
+# mode costs in accuracy. This doubles the OCR work; full runs only, None to skip.
+COMPARE_OCR_MODE = None
+
+# --- Pre-processing Settings ---
+APPLY_RESCALING = False
+APPLY_BINARIZATION = True
+APPLY_DESKEW = False
+# Order in which the enabled steps run on each crop ('rescale', 'binarize').
+PREPROCESSING_ORDER = ('rescale', 'binarize')
+# Convert crops that will be binarized to grayscale first, so rescaling works on one
+# channel instead of three (10-20% faster). Noisy crops can binarize slightly
+# differently, which changes WER/CER, so compare before turning it on.
+GRAYSCALE_FIRST = False
+# Write intermediate crops into reused buffers, and pre-process all crops of an image
+# on one padded canvas per step. Neither changes the results; on typical text-line
+# crops both are slower, so measure with python -m benchmarks.bench_preprocessing.
+REUSE_PREPROCESSING_BUFFERS = False
+BATCH_CROPS = False
+
+# --- Parallelism Settings ---
+# Number of OCR worker processes. 1 runs everything in this process, None uses every core.
+WORKERS = 1
+# Box-heavy images are split into chunks of this many boxes across the workers.
+BOXES_PER_TASK = 32
+# With a single worker, up to PREFETCH_DEPTH upcoming images are read and decoded
+# on IO_THREADS background threads while the current one is OCR'd. 0 disables it.
+PREFETCH_DEPTH = 4
+IO_THREADS = 2
+
+# --- OCR Result Cache ---
+# Unchanged boxes are answered from the cache on reruns. Set USE_OCR_CACHE to False
+# to bypass it, or CLEAR_OCR_CACHE to True to empty it before the run.
+USE_OCR_CACHE = True
+CLEAR_OCR_CACHE = False
+OCR_CACHE_DIR = '.ocr_cache'
+OCR_CACHE_MAX_MB = 512
+
+# --- Run Profiling ---
+# Records the time spent per pipeline stage (parse, decode, deskew, crop, cache,
+# rescale, binarize, ocr, evaluate) and the slowest images and boxes. The
+# overhead is a few microseconds per box, so it is safe to leave on.
+PROFILE_RUN = True
+OUTPUT_PROFILE_JSON = os.path.join('output', 'ocr_run_profile.json')
+OUTPUT_PROFILE_PROM = os.path.join('output', 'ocr_run_profile.prom')
+
+# --- Parameter Sweep (python main.py --sweep) ---
+# Every combination of these values is evaluated in a single pass over the images.
+SWEEP_GRID = {
+    'psm': [6, 7],
+    'oem': [3],
+    'apply_rescaling': [False, True],
+    'apply_binarization': [False, True],
+    'apply_deskew': [False],
+    'ocr_mode': ['per_crop', 'stitched', 'adaptive'],
+}
+OUTPUT_SWEEP_CSV = os.path.join('output', 'ocr_parameter_sweep.csv')
 
 # --- Main Workflow ---
-def run_evaluation_pipeline():
+def run_settings():
+    """Returns the settings that determine the results, recorded in the result log."""
+    return {
+        'image_dir': IMAGE_DIR,
+        'ground_truth': GROUND_TRUTH_JSON,
+        'psm': PSM_SETTING,
+        'oem': OEM_SETTING,
+        'backend': OCR_BACKEND,
+        'ocr_mode': OCR_MODE,
+        'confidence_threshold': ADAPTIVE_CONFIDENCE_THRESHOLD if OCR_MODE == 'adaptive' else None,
+        'apply_rescaling': APPLY_RESCALING,
+        'apply_binarization': APPLY_BINARIZATION,
+        'apply_deskew': APPLY_DESKEW,
+        'preprocessing': PreprocessingPipeline.from_flags(
+            APPLY_RESCALING, APPLY_BINARIZATION, order=PREPROCESSING_ORDER,
+            grayscale_first=GRAYSCALE_FIRST).describe() if OCR_MODE != 'adaptive' else None,
+    }
+
+def box_dicts(boxes):
+    """The boxes of a record as dicts; dataset.ImageAnnotations are converted, with their OCR results."""
+    return boxes.to_boxes() if isinstance(boxes, ImageAnnotations) else boxes
+
+def split_compare_boxes(boxes):
+    """
+    Moves the fields of the comparison OCR mode (run_ocr.COMPARE_PREFIX) off
+    `boxes` and returns them as a second list of boxes, with the same ground
+    truth, whose OCR fields are those of the comparison mode.
+    """
+    compare_boxes = []
+    for box_info in boxes:
+        compare_box = {name: value for name, value in box_info.items()
+                       if not name.startswith(('ocr_', COMPARE_PREFIX))}
+        for name in [name for name in box_info if name.startswith(COMPARE_PREFIX)]:
+            compare_box[name[len(COMPARE_PREFIX):]] = box_info.pop(name)
+        compare_boxes.append(compare_box)
+    return compare_boxes
+
+def save_reports(evaluation_df, results_paths, adaptive, report_csv, box_report_csv):
+    """
+    Prints the per-image report and saves it, plus the per-box report built from
+    the result logs at `results_paths`.
+    """
+    print("\n--- OCR Evaluation Report ---")
+    pd.set_option('display.max_rows', None)
+    pd.set_option('display.width', 140)
+    print(evaluation_df.round(2))
+
+    os.makedirs(os.path.dirname(report_csv), exist_ok=True)
+    evaluation_df.to_csv(report_csv, index=False)
+    write_box_report(iter_merged_records(results_paths), box_report_csv, adaptive=adaptive)
+
+    if adaptive:
+        box_report_df = pd.read_csv(box_report_csv,
+                                    usecols=['OCR Path', 'OCR Confidence', 'OCR Attempts', 'CER (%)'])
+        print("\n--- Adaptive OCR Paths ---")
+        path_summary = box_report_df.groupby('OCR Path').agg(
+            Boxes=('OCR Path', 'size'), Attempts=('OCR Attempts', 'mean'),
+            Confidence=('OCR Confidence', 'mean'), CER=('CER (%)', 'mean'))
+        print(path_summary.round(2))
+        print(f"Mean Tesseract calls per box: {box_report_df['OCR Attempts'].mean():.2f}")
+
+    print(f"\n--- Pipeline Complete ---")
+    print(f"Detailed report saved to: {report_csv}")
+    print(f"Per-box report saved to: {box_report_csv}")
+
+def run_evaluation_pipeline(resume=False, shard=None):
     """
-    Executes the full OCR evaluation pipeline.
+    Executes the full OCR evaluation pipeline. With `resume`, images already in
+    OUTPUT_RESULTS_JSONL from an interrupted run are restored instead of OCR'd again.
+    With `shard=(k, n)` only the images of shard k of n are evaluated (see
+    result_log.shard_of), and every output file gets a shard suffix.
     """
     print("--- Starting OCR Evaluation Pipeline ---")
+    profiler = RunProfiler() if PROFILE_RUN else NULL_PROFILER
+    results_jsonl = shard_path(OUTPUT_RESULTS_JSONL, shard)
 
     # 1. Load Ground Truth Data
     print(f"\n[Step 1/3] Parsing ground truth text from: {GROUND_TRUTH_JSON}")
     if not os.path.exists(GROUND_TRUTH_JSON):
         print(f"FATAL: Ground truth file not found at '{GROUND_TRUTH_JSON}'.")
         return
-    ground_truth_data = parse_label_studio_export(GROUND_TRUTH_JSON)
-    if not ground_truth_data:
-        print("FATAL: No ground truth data could be parsed. Exiting.")
+    if not os.path.isdir(IMAGE_DIR):
+        print(f"FATAL: Image directory not found at '{IMAGE_DIR}'.")
         return
-    print(f"Successfully loaded ground truth for {len(ground_truth_data)} images.")
+
+    if STREAM_GROUND_TRUTH:
+        # Tasks are parsed lazily and handed to the OCR stage one at a time.
+        ground_truth_records = profiler.timed_iter('parse', iter_label_studio_export(GROUND_TRUTH_JSON))
+        print("Streaming ground truth tasks into the OCR stage as they are parsed.")
+    else:
+        # The whole export is loaded up front, in the compact array-backed form.
+        with profiler.stage('parse'):
+            ground_truth_data = CompactDataset.from_label_studio(GROUND_TRUTH_JSON)
+        if not len(ground_truth_data):
+            print("FATAL: No ground truth data could be parsed. Exiting.")
+            return
+        print(f"Successfully loaded ground truth for {len(ground_truth_data)} images "
+              f"({ground_truth_data.box_count} boxes, {ground_truth_data.nbytes / 2**20:.1f} MB).")
+        # The OCR stage reads the coordinate arrays directly and stores its results in the dataset.
+        ground_truth_records = ((image.filename, image) for image in ground_truth_data)
+    if shard:
+        print(f"Evaluating shard {shard[0]} of {shard[1]}.")
+        ground_truth_records = ((filename, boxes) for filename, boxes in ground_truth_records
+                                if shard_of(filename, shard[1]) == shard[0])
 
     # 2. Execute Tesseract OCR on Bounding Box Regions
     print(f"\n[Step 2/3] Running Tesseract OCR on bounding box regions from: {GROUND_TRUTH_JSON}")
-    if not os.path.isdir(IMAGE_DIR):
-        print(f"FATAL: Image directory not found at '{IMAGE_DIR}'.")
+
+    try:
+        result_log = ResultLog(results_jsonl, run_settings(), resume=resume, shard=shard)
+    except SettingsMismatchError as e:
+        print(f"FATAL: Cannot resume, {e}. Rerun without --resume to start over.")
         return
+    accumulator = EvaluationAccumulator()
+    for row, counts in result_log.completed.values():
+        accumulator.add_row(row, counts)
+    if result_log.completed:
+        print(f"Resuming: {len(result_log.completed)} images restored from '{results_jsonl}'.")
+        completed = result_log.completed
+        ground_truth_records = ((filename, boxes) for filename, boxes in ground_truth_records
+                                if filename not in completed)
+
+    ocr_cache = None
+    if USE_OCR_CACHE:
+        ocr_cache = OCRCache(OCR_CACHE_DIR, max_size_mb=OCR_CACHE_MAX_MB)
+        if CLEAR_OCR_CACHE:
+            print(f"Clearing the OCR cache at '{OCR_CACHE_DIR}'.")
+            ocr_cache.clear()
     
-    ocr_results = batch_ocr_with_bounding_boxes(
+    ocr_settings = dict(
         image_dir=IMAGE_DIR, 
-        json_filepath=GROUND_TRUTH_JSON,
         psm=PSM_SETTING, 
         oem=OEM_SETTING,
-        apply_preprocessing=True
+        apply_rescaling=APPLY_RESCALING,
+        apply_binarization=APPLY_BINARIZATION,
+        apply_deskew=APPLY_DESKEW,
+        workers=WORKERS,
+        boxes_per_task=BOXES_PER_TASK,
+        backend=OCR_BACKEND,
+        cache=ocr_cache,
+        confidence_threshold=ADAPTIVE_CONFIDENCE_THRESHOLD,
+        prefetch_depth=PREFETCH_DEPTH,
+        io_threads=IO_THREADS,
+        preprocessing_order=PREPROCESSING_ORDER,
+        grayscale_first=GRAYSCALE_FIRST,
+        reuse_buffers=REUSE_PREPROCESSING_BUFFERS,
+        batch_crops=BATCH_CROPS
     )
-    
-    if not ocr_results:
-        print("FATAL: OCR processing returned no results. Exiting.")
-        return
+    compare_mode = None
+    compare_accumulator = None
+    if COMPARE_OCR_MODE and COMPARE_OCR_MODE != OCR_MODE and result_log.completed:
+        print(f"COMPARE_OCR_MODE is ignored with --resume: restored images were only OCR'd in '{OCR_MODE}' mode.")
+    elif COMPARE_OCR_MODE and COMPARE_OCR_MODE != OCR_MODE:
+        # Each image is decoded once and OCR'd in both modes in the same pass.
+        compare_mode = COMPARE_OCR_MODE
+        compare_accumulator = EvaluationAccumulator(include_box_metrics=False)
+    ocr_stream = iter_ocr_results(records=ground_truth_records, ocr_mode=OCR_MODE, compare_mode=compare_mode,
+                                  profiler=profiler if PROFILE_RUN else None, **ocr_settings)
 
     # 3. Quantitative Evaluation
-    print("\n[Step 3/3] Evaluating OCR performance...")
-    evaluation_df = evaluate_tesseract_performance(ground_truth_data, ocr_results)
+    # Each image is scored as soon as its OCR finishes and appended to the result
+    # log; only the per-image rows and running error counts are kept in memory.
+    print("\n[Step 3/3] Evaluating OCR performance as images complete...")
+    try:
+        for filename, boxes in ocr_stream:
+            with profiler.stage('evaluate', filename):
+                boxes = box_dicts(boxes)
+                if compare_accumulator is not None:
+                    compare_accumulator.add(filename, split_compare_boxes(boxes))
+                row, counts = accumulator.add(filename, boxes)
+                result_log.append(filename, row, counts, boxes,
+                                  image=image_signature(os.path.join(IMAGE_DIR, filename)))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. {len(accumulator.rows)} images are saved in '{results_jsonl}'; "
+              f"run again with --resume to continue.")
+        return
+    finally:
+        result_log.close()
+        if ocr_cache is not None:
+            ocr_cache.close()
 
+    evaluation_df = accumulator.report()
     if evaluation_df.empty:
         print("FATAL: Evaluation produced no results.")
         return
+    if compare_accumulator is not None and compare_accumulator.rows:
+        evaluation_df = compare_reports(evaluation_df, compare_accumulator.report(), COMPARE_OCR_MODE)
         
     # --- Display and Save Results ---
-    print("\n--- OCR Evaluation Report ---")
-    pd.set_option('display.max_rows', None)
-    pd.set_option('display.width', 140)
-    print(evaluation_df.round(2))
+    save_reports(evaluation_df, [results_jsonl], OCR_MODE == 'adaptive',
+                 shard_path(OUTPUT_REPORT_CSV, shard), shard_path(OUTPUT_BOX_REPORT_CSV, shard))
+    if compare_accumulator is not None and compare_accumulator.rows:
+        aggregate = evaluation_df.iloc[-1]
+        print(f"Aggregate WER/CER: {aggregate['WER (%)']:.2f}% / {aggregate['CER (%)']:.2f}% with '{OCR_MODE}', "
+              f"{aggregate[f'{COMPARE_OCR_MODE} WER (%)']:.2f}% / {aggregate[f'{COMPARE_OCR_MODE} CER (%)']:.2f}% "
+              f"with '{COMPARE_OCR_MODE}'.")
+    print(f"Per-image results log saved to: {results_jsonl}")
 
-    os.makedirs(os.path.dirname(OUTPUT_REPORT_CSV), exist_ok=True)
-    evaluation_df.to_csv(OUTPUT_REPORT_CSV, index=False)
-    print(f"\n--- Pipeline Complete ---")
-    print(f"Detailed report saved to: {OUTPUT_REPORT_CSV}")
+    if PROFILE_RUN:
+        print("\n--- Run Profile ---")
+        print(profiler.summary())
+        profile_json, profile_prom = shard_path(OUTPUT_PROFILE_JSON, shard), shard_path(OUTPUT_PROFILE_PROM, shard)
+        profiler.to_json(profile_json)
+        with open(profile_prom, 'w', encoding='utf-8') as f:
+            f.write(profiler.to_prometheus())
+        print(f"Run profile saved to: {profile_json} and {profile_prom}")
+
+def run_incremental_pipeline():
+    """
+    Re-evaluates a new Label Studio export against the previous run recorded in
+    OUTPUT_RESULTS_JSONL. Only boxes whose geometry changed (or whose image file
+    changed) are OCR'd again, only images whose ground truth or OCR changed are
+    re-scored, and every other image keeps its previous row, counts and box
+    metrics. The result log is replaced by the updated one at the end.
+    """
+    print("--- Starting Incremental OCR Evaluation ---")
+    if not os.path.exists(GROUND_TRUTH_JSON):
+        print(f"FATAL: Ground truth file not found at '{GROUND_TRUTH_JSON}'.")
+        return
+    header = read_log_header(OUTPUT_RESULTS_JSONL) if os.path.exists(OUTPUT_RESULTS_JSONL) else None
+    if header is None:
+        print(f"FATAL: No previous run found at '{OUTPUT_RESULTS_JSONL}'. Run the full pipeline first.")
+        return
+    settings = run_settings()
+    # The export file name changes with every export; every other setting must match.
+    if {**header['settings'], 'ground_truth': None} != {**settings, 'ground_truth': None}:
+        print(f"FATAL: The previous run used different settings: {header['settings']}. "
+              f"Run the full pipeline instead.")
+        return
+    previous_records = {record['filename']: record for record in iter_result_log(OUTPUT_RESULTS_JSONL)}
+    print(f"Loaded the manifest of {len(previous_records)} images from the previous run.")
+
+    # The updated log is written next to the previous one and only replaces it when complete.
+    updated_path = OUTPUT_RESULTS_JSONL + '.updated'
+    result_log = ResultLog(updated_path, settings)
+    accumulator = EvaluationAccumulator()
+    actions = {'reuse': 0, 'rescore': 0, 'reocr': 0}
+    changes = dict.fromkeys(('added', 'removed', 'moved', 'edited'), 0)
+    boxes_reocr = 0
+    plan = []               # (filename, action, boxes, signature, task, previous row and counts), in export order
+    pending_images = {}     # filename -> (boxes, indexes of the boxes to OCR)
+    seen = set()
+    missing_images = 0
+
+    start = time.perf_counter()
+    for filename, boxes, task in iter_export_manifest(GROUND_TRUTH_JSON):
+        seen.add(filename)
+        signature = image_signature(os.path.join(IMAGE_DIR, filename))
+        if signature is None:
+            # Skipped, like the OCR stage of a full run does.
+            missing_images += 1
+            continue
+        previous = previous_records.get(filename)
+        action, pending, image_changes = plan_image(previous, boxes, task, signature,
+                                                    whole_image=OCR_MODE == 'stitched')
+        actions[action] += 1
+        for key, count in image_changes.items():
+            changes[key] += count
+
+        if action == REUSE:
+            for box, previous_box in zip(boxes, previous['boxes']):
+                box.update(wer=previous_box['wer'], cer=previous_box['cer'])
+            plan.append((filename, action, boxes, signature, task, (previous['row'], previous['counts'])))
+        else:
+            plan.append((filename, action, boxes, signature, task, None))
+        if action == REOCR:
+            pending_images[filename] = (boxes, pending)
+            boxes_reocr += len(pending)
+    removed_images = len(set(previous_records) - seen)
+    del previous_records
+
+    print(f"Images: {actions['reuse']} unchanged, {actions['rescore']} re-scored, "
+          f"{actions['reocr']} to OCR ({boxes_reocr} boxes), {removed_images} removed from the export, "
+          f"{missing_images} image files not found.")
+    print(f"Boxes: {changes['added']} added, {changes['removed']} removed, "
+          f"{changes['moved']} moved, {changes['edited']} with edited text.")
+
+    ocr_done = set()
+    if pending_images:
+        ocr_cache = OCRCache(OCR_CACHE_DIR, max_size_mb=OCR_CACHE_MAX_MB) if USE_OCR_CACHE else None
+        records = ((filename, [boxes[index] for index in pending])
+                   for filename, (boxes, pending) in pending_images.items())
+        try:
+            # The pending boxes are the same dictionaries as in the full box lists,
+            # so their new OCR text lands in place.
+            for filename, _ in iter_ocr_results(
+                image_dir=IMAGE_DIR, records=records, psm=PSM_SETTING, oem=OEM_SETTING,
+                apply_rescaling=APPLY_RESCALING, apply_binarization=APPLY_BINARIZATION,
+                apply_deskew=APPLY_DESKEW, workers=WORKERS,
+                boxes_per_task=BOXES_PER_TASK, backend=OCR_BACKEND, cache=ocr_cache,
+                ocr_mode=OCR_MODE, confidence_threshold=ADAPTIVE_CONFIDENCE_THRESHOLD,
+                prefetch_depth=PREFETCH_DEPTH, io_threads=IO_THREADS,
+                preprocessing_order=PREPROCESSING_ORDER, grayscale_first=GRAYSCALE_FIRST,
+                reuse_buffers=REUSE_PREPROCESSING_BUFFERS, batch_crops=BATCH_CROPS
+            ):
+                ocr_done.add(filename)
+        finally:
+            if ocr_cache is not None:
+                ocr_cache.close()
+
+    # Rows are written in export order, so the report lines up with that of a full run.
+    for filename, action, boxes, signature, task, previous in plan:
+        if action == REUSE:
+            row, counts = previous
+            accumulator.add_row(row, counts)
+        elif action == RESCORE or filename in ocr_done:
+            row, counts = accumulator.add(filename, boxes)
+        else:
+            # The image file became unreadable after it was planned.
+            continue
+        result_log.append(filename, row, counts, boxes, image=signature, task=task)
+    result_log.close()
+    os.replace(updated_path, OUTPUT_RESULTS_JSONL)
+    print(f"Incremental update took {time.perf_counter() - start:.1f}s.")
+
+    evaluation_df = accumulator.report()
+    if evaluation_df.empty:
+        print("FATAL: Evaluation produced no results.")
+        return
+    save_reports(evaluation_df, [OUTPUT_RESULTS_JSONL], OCR_MODE == 'adaptive',
+                 OUTPUT_REPORT_CSV, OUTPUT_BOX_REPORT_CSV)
+
+def run_merge_pipeline(results_paths):
+    """
+    Combines the result logs of several shards (or any set of partial runs) into
+    the final per-image and per-box reports. The aggregate WER/CER come from the
+    summed error counts of every image, so they equal those of one unsharded run.
+    """
+    print("--- Merging Partial OCR Results ---")
+    for path in results_paths:
+        if not os.path.exists(path):
+            print(f"FATAL: Result log not found at '{path}'.")
+            return
+    try:
+        accumulator, settings = merge_result_logs(results_paths)
+    except SettingsMismatchError as e:
+        print(f"FATAL: Cannot merge, {e}.")
+        return
+    print(f"Merged {len(accumulator.rows)} images from {len(results_paths)} result logs.")
+
+    evaluation_df = accumulator.report()
+    if evaluation_df.empty:
+        print("FATAL: The result logs contain no images.")
+        return
+    save_reports(evaluation_df, results_paths, settings['ocr_mode'] == 'adaptive',
+                 OUTPUT_REPORT_CSV, OUTPUT_BOX_REPORT_CSV)
+
+def run_sweep_pipeline():
+    """
+    Evaluates every configuration in SWEEP_GRID and saves a comparison table of
+    aggregate WER/CER and time per configuration.
+    """
+    print("--- Starting OCR Parameter Sweep ---")
+    if not os.path.exists(GROUND_TRUTH_JSON):
+        print(f"FATAL: Ground truth file not found at '{GROUND_TRUTH_JSON}'.")
+        return
+    if not os.path.isdir(IMAGE_DIR):
+        print(f"FATAL: Image directory not found at '{IMAGE_DIR}'.")
+        return
+
+    ground_truth_data = parse_label_studio_export(GROUND_TRUTH_JSON)
+    if not ground_truth_data:
+        print("FATAL: No ground truth data could be parsed. Exiting.")
+        return
+
+    sweep_df = run_parameter_sweep(IMAGE_DIR, ground_truth_data, expand_grid(SWEEP_GRID),
+                                   backend=OCR_BACKEND, workers=WORKERS,
+                                   preprocessing_order=PREPROCESSING_ORDER, grayscale_first=GRAYSCALE_FIRST,
+                                   confidence_threshold=ADAPTIVE_CONFIDENCE_THRESHOLD)
+    if sweep_df.empty:
+        print("FATAL: The sweep produced no results.")
+        return
+
+    print("\n--- Parameter Sweep Comparison ---")
+    pd.set_option('display.width', 160)
+    print(sweep_df.round(2).to_string(index=False))
+
+    os.makedirs(os.path.dirname(OUTPUT_SWEEP_CSV), exist_ok=True)
+    sweep_df.to_csv(OUTPUT_SWEEP_CSV, index=False)
+    print(f"\nSweep report saved to: {OUTPUT_SWEEP_CSV}")
 
 if __name__ == '__main__':
-    run_evaluation_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Tesseract OCR evaluation pipeline.')
+    parser.add_argument('--sweep', action='store_true',
+                        help='Evaluate every configuration in SWEEP_GRID instead of a single run.')
+    parser.add_argument('--resume', action='store_true',
+                        help=f'Continue an interrupted run, skipping the images already in {OUTPUT_RESULTS_JSONL}.')
+    parser.add_argument('--shard', type=parse_shard, metavar='K/N',
+                        help='Evaluate only shard K of N (images are assigned by a hash of their filename).')
+    parser.add_argument('--merge', nargs='+', metavar='RESULTS_JSONL',
+                        help='Combine the result logs of several shards into the final reports.')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'Re-evaluate only what changed in the export since the run in {OUTPUT_RESULTS_JSONL}.')
+    args = parser.parse_args()
+
+    if args.sweep:
+        run_sweep_pipeline()
+    elif args.merge:
+        run_merge_pipeline(args.merge)
+    elif args.incremental:
+        run_incremental_pipeline()
+    else:
+        run_evaluation_pipeline(resume=args.resume, shard=args.shard)
\ No newline at end of file
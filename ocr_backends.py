@@ -0,0 +1,186 @@
+# ocr_backends.py
+import os
+import threading
+import pytesseract
+import cv2
+import numpy as np
+
+# tesserocr is optional. It links against the Tesseract library directly, so a
+# single engine can stay loaded across many crops instead of forking the
+# `tesseract` binary for every call.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+class OCRBackend:
+    """
+    Common interface for the OCR engines. A backend is created once with the
+    language and Tesseract settings and then called for every crop.
+    """
+    name = None
+
+    def __init__(self, lang='eng', oem=3, psm=7):
+        self.lang = lang
+        self.oem = oem
+        self.psm = psm
+
+    def image_to_string(self, image):
+        """Returns the text recognized in a numpy image (BGR or grayscale)."""
+        raise NotImplementedError
+
+    def image_to_data(self, image):
+        """
+        Returns the words recognized in a numpy image as dicts with the keys
+        text, left, top, width, height, conf and line, in reading order. `line`
+        identifies the text line a word belongs to.
+        """
+        raise NotImplementedError
+
+    def version(self):
+        """Returns the version string of the underlying Tesseract engine."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases any engine resources held by the backend."""
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """
+    Runs every crop through pytesseract, which writes a temporary image and
+    starts a new `tesseract` process per call.
+    """
+    name = 'pytesseract'
+
+    def __init__(self, lang='eng', oem=3, psm=7):
+        super().__init__(lang, oem, psm)
+        self.config = f'--oem {oem} --psm {psm}'
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+
+    def image_to_data(self, image):
+        data = pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for index, text in enumerate(data['text']):
+            # Level 5 rows are words; the others describe pages, blocks, paragraphs and lines.
+            if data['level'][index] != 5 or not text.strip():
+                continue
+            words.append({
+                'text': text.strip(),
+                'left': data['left'][index],
+                'top': data['top'][index],
+                'width': data['width'][index],
+                'height': data['height'][index],
+                'conf': float(data['conf'][index]),
+                'line': (data['block_num'][index], data['par_num'][index], data['line_num'][index]),
+            })
+        return words
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Keeps one Tesseract API handle alive with the language model loaded and
+    feeds it numpy buffers directly, with no temporary files.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', oem=3, psm=7):
+        if tesserocr is None:
+            raise ImportError("The 'tesserocr' backend requires the tesserocr package.")
+        super().__init__(lang, oem, psm)
+        self._api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem, psm=psm)
+
+    def _set_image(self, image):
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            bytes_per_pixel = 3
+        else:
+            bytes_per_pixel = 1
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        self._api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, image.strides[0])
+
+    def image_to_string(self, image):
+        self._set_image(image)
+        return self._api.GetUTF8Text()
+
+    def image_to_data(self, image):
+        self._set_image(image)
+        self._api.Recognize()
+        words = []
+        line = 0
+        iterator = self._api.GetIterator()
+        for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+            if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line += 1
+            text = word.GetUTF8Text(tesserocr.RIL.WORD)
+            bounding_box = word.BoundingBox(tesserocr.RIL.WORD)
+            if not text or not text.strip() or bounding_box is None:
+                continue
+            left, top, right, bottom = bounding_box
+            words.append({
+                'text': text.strip(),
+                'left': left,
+                'top': top,
+                'width': right - left,
+                'height': bottom - top,
+                'conf': word.Confidence(tesserocr.RIL.WORD),
+                'line': line,
+            })
+        return words
+
+    def version(self):
+        return tesserocr.tesseract_version().splitlines()[0]
+
+    def close(self):
+        self._api.End()
+
+
+BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+# Backends are cached per thread. The process id is part of the key because
+# forked worker processes inherit the parent's thread-local state.
+_local = threading.local()
+
+
+def available_backends():
+    """Returns the names of the backends that can be used in this environment."""
+    names = [PytesseractBackend.name]
+    if tesserocr is not None:
+        names.append(TesserocrBackend.name)
+    return names
+
+
+def resolve_backend_name(name='auto'):
+    """Maps 'auto' to the fastest installed backend and validates explicit names."""
+    if name == 'auto':
+        return TesserocrBackend.name if tesserocr is not None else PytesseractBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return name
+
+
+def get_backend(name='auto', lang='eng', oem=3, psm=7):
+    """
+    Returns a backend for the current thread, creating it on first use so the
+    Tesseract model is only loaded once per worker and configuration.
+    """
+    name = resolve_backend_name(name)
+    cache = getattr(_local, 'backends', None)
+    if cache is None:
+        cache = _local.backends = {}
+
+    key = (os.getpid(), name, lang, oem, psm)
+    if key not in cache:
+        cache[key] = BACKENDS[name](lang=lang, oem=oem, psm=psm)
+    return cache[key]
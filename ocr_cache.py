@@ -0,0 +1,162 @@
+# ocr_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR results backed by a small SQLite database.
+
+    Entries are content addressed: the key is a hash of the image file contents,
+    the pixel box, the pre-processing flags and the Tesseract settings/version,
+    so a changed image or setting simply misses instead of returning stale text.
+    The cache is safe to share between worker processes; each process opens its
+    own connection and keeps its own hit/miss counters.
+    """
+
+    def __init__(self, cache_dir='.ocr_cache', max_size_mb=512):
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, 'ocr_cache.sqlite3')
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pending = []
+        self._touched = []
+
+    def __getstate__(self):
+        # Connections cannot be pickled; worker processes open their own.
+        state = self.__dict__.copy()
+        state.update(_conn=None, _pending=[], _touched=[], hits=0, misses=0)
+        return state
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=60)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_results ('
+                'key TEXT PRIMARY KEY, text TEXT NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON ocr_results (last_used)')
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def settings_signature(**settings):
+        """Serializes the OCR settings that influence the result into a stable string."""
+        return json.dumps(settings, sort_keys=True)
+
+    @staticmethod
+    def _format_box(box):
+        pixels = ','.join(str(int(v)) for v in box[:4])
+        rotation = ''.join(f',{float(v)!r}' for v in box[4:])
+        return pixels + rotation
+
+    @staticmethod
+    def make_key(image_digest, box, settings_signature):
+        """
+        Builds the cache key for one pixel box (x, y, w, h) of an image, or
+        (x, y, w, h, rotation) for a rotated box. The rotation is kept exact, so
+        editing it by a fraction of a degree gives a new key.
+        """
+        raw = f"{image_digest}|{OCRCache._format_box(box)}|{settings_signature}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_image_key(image_digest, boxes, settings_signature):
+        """
+        Builds the cache key for all pixel boxes of an image, in order. Stitched
+        OCR caches an image's results as a whole under this key, because the
+        text of each box depends on the other boxes on its canvas.
+        """
+        pixels = ';'.join(OCRCache._format_box(box) for box in boxes)
+        raw = f"{image_digest}|boxes={pixels}|{settings_signature}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Returns the cached text for a key, or None on a miss."""
+        row = self._connect().execute('SELECT text FROM ocr_results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append(key)
+        return row[0]
+
+    def put(self, key, text):
+        """Queues a result for storage. Results are written on flush()."""
+        self._pending.append((key, text, len(key) + len(text.encode('utf-8'))))
+
+    def flush(self):
+        """Writes queued results and access times in a single transaction."""
+        if not self._pending and not self._touched:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO ocr_results (key, text, size, last_used) VALUES (?, ?, ?, ?)',
+                [(key, text, size, now) for key, text, size in self._pending]
+            )
+            conn.executemany('UPDATE ocr_results SET last_used = ? WHERE key = ?',
+                             [(now, key) for key in self._touched])
+        self._pending = []
+        self._touched = []
+
+    def size_bytes(self):
+        """Returns the total size of the stored entries."""
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM ocr_results').fetchone()[0]
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        max_size_mb. Returns the number of removed entries.
+        """
+        self.flush()
+        conn = self._connect()
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        removed = 0
+        freed = 0
+        keys = []
+        for key, size in conn.execute('SELECT key, size FROM ocr_results ORDER BY last_used ASC'):
+            keys.append((key,))
+            freed += size
+            removed += 1
+            if freed >= excess:
+                break
+        with conn:
+            conn.executemany('DELETE FROM ocr_results WHERE key = ?', keys)
+        return removed
+
+    def clear(self):
+        """Deletes every cached result."""
+        self._pending = []
+        self._touched = []
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM ocr_results')
+        conn.execute('VACUUM')
+
+    def stats(self):
+        """Returns the hit/miss counters of this process."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
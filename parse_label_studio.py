@@ -2,6 +2,132 @@
 import json
 import os
 
+def iter_label_studio_tasks(json_filepath, chunk_size=1 << 20):
+    """
+    Yields the tasks of a Label Studio JSON export one at a time.
+    The export is a single top-level JSON array; it is read in chunks of
+    `chunk_size` characters and each task is decoded as soon as it is complete,
+    so memory use depends on the largest task rather than on the export size.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_filepath, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def next_token():
+            # Skips whitespace (reading more data when needed) and returns the next character.
+            nonlocal buffer, pos, eof
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return ''
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+
+        if next_token() != '[':
+            raise ValueError(f"Expected a JSON array of tasks in {json_filepath}")
+        pos += 1
+
+        expect_separator = False
+        while True:
+            token = next_token()
+            if token == ']':
+                return
+            if token == '':
+                raise ValueError(f"Unexpected end of file in {json_filepath}")
+            if expect_separator:
+                if token != ',':
+                    raise ValueError(f"Expected ',' between tasks in {json_filepath}")
+                pos += 1
+                next_token()
+
+            while True:
+                try:
+                    task, end = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    # The task is not complete yet: append the next chunk and retry.
+                    if eof:
+                        raise
+                    chunk = f.read(chunk_size)
+                    eof = not chunk
+                    buffer, pos = buffer[pos:] + chunk, 0
+
+            pos = end
+            # Drop the consumed part of the buffer so it does not grow with the file.
+            if pos >= chunk_size:
+                buffer, pos = buffer[pos:], 0
+            expect_separator = True
+            yield task
+
+def parse_task(task):
+    """
+    Extracts the original filename and the boxes with their ground truth text
+    from a single Label Studio task. Returns None for tasks without usable boxes.
+    It links text and box annotations by their shared 'id'.
+    """
+    file_upload_name = task.get('file_upload')
+    if not file_upload_name:
+        return None
+
+    # This handles cases where the original filename might contain hyphens.
+    # It assumes the format is "uuid-original_filename.jpg"
+    parts = file_upload_name.split('-')
+    if len(parts) > 1:
+        original_filename = '-'.join(parts[1:])
+    else:
+        original_filename = file_upload_name
+
+    annotations = task.get('annotations', [{}])[0].get('result', [])
+    if not annotations:
+        return None
+
+    grouped_results = {}
+    for ann in annotations:
+        ann_id = ann.get('id')
+        if ann_id:
+            if ann_id not in grouped_results:
+                grouped_results[ann_id] = {}
+            # Merge the data for the same ID
+            if 'text' in ann.get('value', {}):
+                grouped_results[ann_id]['text'] = ann['value']['text'][0]
+            if ann.get('type') == 'rectangle':
+                grouped_results[ann_id].update(ann)
+
+    boxes_with_text = []
+    for ann_id, data in grouped_results.items():
+        if data.get('type') == 'rectangle' and 'value' in data:
+            coords = data['value']
+            boxes_with_text.append({
+                'id': ann_id, # Label Studio region id, used to match boxes across exports
+                'coords': {
+                    'x': coords['x'],
+                    'y': coords['y'],
+                    'width': coords['width'],
+                    'height': coords['height'],
+                    'rotation': coords.get('rotation', 0)
+                },
+                'gt_text': data.get('text', '') # Get text from the grouped data
+            })
+
+    if not boxes_with_text:
+        return None
+    return original_filename, boxes_with_text
+
+def iter_label_studio_export(json_filepath):
+    """
+    Streams a Label Studio JSON export and yields a (filename, boxes) record for
+    every task with annotated boxes, as soon as that task has been read.
+    """
+    for task in iter_label_studio_tasks(json_filepath):
+        record = parse_task(task)
+        if record is not None:
+            yield record
+
 def parse_label_studio_export(json_filepath):
     """
     Parses a Label Studio JSON export to extract ground truth text and bounding boxes.
@@ -9,57 +135,10 @@ def parse_label_studio_export(json_filepath):
     """
     ground_truth_data = {}
     try:
-        with open(json_filepath, 'r', encoding='utf-8') as f:
-            tasks = json.load(f)
+        for filename, boxes in iter_label_studio_export(json_filepath):
+            ground_truth_data[filename] = {'boxes': boxes}
     except FileNotFoundError:
         print(f"Error: The ground truth file was not found at {json_filepath}")
         return {}
 
-    for task in tasks:
-        file_upload_name = task.get('file_upload')
-        if not file_upload_name:
-            continue
-        
-        # This handles cases where the original filename might contain hyphens.
-        # It assumes the format is "uuid-original_filename.jpg"
-        parts = file_upload_name.split('-')
-        if len(parts) > 1:
-            original_filename = '-'.join(parts[1:])
-        else:
-            original_filename = file_upload_name
-
-        annotations = task.get('annotations', [{}])[0].get('result', [])
-        if not annotations:
-            continue
-
-        grouped_results = {}
-        for ann in annotations:
-            ann_id = ann.get('id')
-            if ann_id:
-                if ann_id not in grouped_results:
-                    grouped_results[ann_id] = {}
-                # Merge the data for the same ID
-                if 'text' in ann.get('value', {}):
-                    grouped_results[ann_id]['text'] = ann['value']['text'][0]
-                if ann.get('type') == 'rectangle':
-                    grouped_results[ann_id].update(ann)
-
-        boxes_with_text = []
-        for ann_id, data in grouped_results.items():
-            if data.get('type') == 'rectangle' and 'value' in data:
-                coords = data['value']
-                boxes_with_text.append({
-                    'coords': {
-                        'x': coords['x'],
-                        'y': coords['y'],
-                        'width': coords['width'],
-                        'height': coords['height'],
-                        'rotation': coords.get('rotation', 0)
-                    },
-                    'gt_text': data.get('text', '') # Get text from the grouped data
-                })
-        
-        if boxes_with_text:
-            ground_truth_data[original_filename] = {'boxes': boxes_with_text}
-
     return ground_truth_data
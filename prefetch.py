@@ -0,0 +1,101 @@
+# prefetch.py
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from profiling import NULL_PROFILER
+
+# Profiler stages for the time each side of the prefetch queue spends blocked.
+# A large 'wait_for_image' means OCR is starved by disk/decode; a large
+# 'wait_for_ocr' means the images are ready early and OCR is the bottleneck.
+CONSUMER_WAIT_STAGE = 'wait_for_image'
+PRODUCER_WAIT_STAGE = 'wait_for_ocr'
+
+_END = object()
+
+
+def new_queue_stats(depth, threads):
+    """Returns the counters filled in by iter_prefetched."""
+    return {'depth': depth, 'threads': threads, 'items': 0, 'max_depth_used': 0,
+            'consumer_wait_seconds': 0.0, 'producer_wait_seconds': 0.0}
+
+
+def _put(slots, entry, stop, stats, profiler):
+    """Puts `entry` into the bounded queue, timing how long the producer is blocked. False if stopped."""
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            slots.put(entry, timeout=0.1)
+        except queue.Full:
+            continue
+        waited = time.perf_counter() - start
+        stats['producer_wait_seconds'] += waited
+        profiler.record(PRODUCER_WAIT_STAGE, waited)
+        stats['max_depth_used'] = max(stats['max_depth_used'], slots.qsize())
+        return True
+    return False
+
+
+def iter_prefetched(items, load, depth=4, threads=2, profiler=NULL_PROFILER, stats=None):
+    """
+    Yields (item, load(item)) for every item, in input order, while upcoming
+    items are already loaded on `threads` background I/O threads. A producer
+    thread pulls from `items`, keeps up to `threads` loads in flight and puts
+    the finished ones, in order, into a queue bounded to `depth` entries, so at
+    most depth + threads + 1 loaded results are held at once. `depth=0` loads
+    each item in the calling thread, without any overlap.
+
+    `stats` is an optional dict (see new_queue_stats) that receives the number
+    of items, the deepest the queue got and how long each side was blocked on
+    it. The waits are also recorded on `profiler`. Errors raised by `items` or
+    `load` are re-raised in the consuming thread.
+    """
+    stats = stats if stats is not None else new_queue_stats(depth, threads)
+    if depth <= 0:
+        for item in items:
+            stats['items'] += 1
+            yield item, load(item)
+        return
+
+    slots = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix='ocr-prefetch')
+
+    def produce():
+        in_flight = deque()
+        try:
+            for item in items:
+                in_flight.append((item, executor.submit(load, item)))
+                if len(in_flight) >= max(threads, 1):
+                    item, future = in_flight.popleft()
+                    if not _put(slots, (item, future.result()), stop, stats, profiler):
+                        return
+            while in_flight:
+                item, future = in_flight.popleft()
+                if not _put(slots, (item, future.result()), stop, stats, profiler):
+                    return
+        except BaseException as e:
+            _put(slots, (_END, e), stop, stats, profiler)
+            return
+        _put(slots, (_END, None), stop, stats, profiler)
+
+    producer = threading.Thread(target=produce, name='ocr-prefetch-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            start = time.perf_counter()
+            item, result = slots.get()
+            waited = time.perf_counter() - start
+            stats['consumer_wait_seconds'] += waited
+            profiler.record(CONSUMER_WAIT_STAGE, waited)
+            if item is _END:
+                if result is not None:
+                    raise result
+                return
+            stats['items'] += 1
+            yield item, result
+    finally:
+        # Also reached when the consumer stops early: release the producer and drop pending loads.
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
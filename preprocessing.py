@@ -0,0 +1,183 @@
+# preprocessing.py
+import cv2
+import numpy as np
+from profiling import NULL_PROFILER
+
+# Steps a PreprocessingPipeline can run, in any order.
+STEPS = ('grayscale', 'rescale', 'binarize')
+# Order of the steps enabled by the apply_rescaling/apply_binarization flags.
+DEFAULT_ORDER = ('rescale', 'binarize')
+DEFAULT_SCALE_FACTOR = 2.0
+# Neighbourhood and offset of the adaptive threshold, as in run_ocr.binarize_image.
+BINARIZE_BLOCK_SIZE = 11
+BINARIZE_C = 2
+# Replicated border around each crop on a batch canvas. It must cover the widest
+# neighbourhood of any step (cubic interpolation reads 2 pixels, the threshold
+# BINARIZE_BLOCK_SIZE // 2) so that no crop sees its neighbours.
+BATCH_PADDING = BINARIZE_BLOCK_SIZE // 2 + 1
+
+
+class BufferPool:
+    """
+    Reusable arrays for the intermediate results of a pipeline: one flat buffer
+    per name that grows to the largest size requested, so crops of similar size
+    share the same memory instead of each allocating new arrays.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape):
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            # Grow with some headroom so a run of slowly growing crops does not reallocate every time.
+            buffer = self._buffers[name] = np.empty(max(size, int(size * 1.25)), dtype=np.uint8)
+        return buffer[:size].reshape(shape)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+class PreprocessingPipeline:
+    """
+    Applies the pre-processing steps to box crops in a configurable order.
+    With the default settings it produces exactly what run_ocr.rescale_image
+    followed by run_ocr.binarize_image did.
+
+    `grayscale_first` makes a pipeline that binarizes convert the crop to
+    grayscale before anything else, since binarization discards the colour
+    anyway; rescaling then interpolates one channel instead of three. This is
+    10-20% faster on rescale+binarize, and clean crops binarize identically,
+    but on noisy crops a few background pixels near the threshold can flip and
+    change the OCR results. It is therefore off by default.
+
+    With `reuse_buffers`, intermediate results are written into reused buffers
+    (see BufferPool); only the final image of each crop is a new array, because
+    the OCR stage keeps it. `process_batch` runs many crops through each step
+    with one OpenCV call per step, on a canvas where every crop has a replicated
+    border, with results identical to calling the pipeline on each crop;
+    `process` uses it with `batch`. On text-line crops both cost more than they
+    save (see benchmarks/bench_preprocessing.py), so both are off by default.
+    """
+
+    def __init__(self, steps=DEFAULT_ORDER, grayscale_first=False, scale_factor=DEFAULT_SCALE_FACTOR,
+                 reuse_buffers=False, batch=False):
+        unknown = [step for step in steps if step not in STEPS]
+        if unknown:
+            raise ValueError(f"Unknown pre-processing step(s) {', '.join(unknown)}. Choose from: {', '.join(STEPS)}")
+        if len(set(steps)) != len(steps):
+            raise ValueError(f"Each pre-processing step may appear only once: {', '.join(steps)}")
+        steps = list(steps)
+        if grayscale_first and 'binarize' in steps and 'grayscale' not in steps:
+            steps.insert(0, 'grayscale')
+        self.steps = tuple(steps)
+        self.scale_factor = scale_factor
+        self.pool = BufferPool() if reuse_buffers else None
+        self.batch = batch
+
+    @classmethod
+    def from_flags(cls, apply_rescaling=False, apply_binarization=True, order=DEFAULT_ORDER, **options):
+        """Builds the pipeline of the apply_* flags, running the enabled steps in `order`."""
+        enabled = {'rescale': apply_rescaling, 'binarize': apply_binarization}
+        return cls([step for step in order if enabled.get(step, True)], **options)
+
+    def describe(self):
+        """The steps joined by '+', e.g. 'grayscale+rescale+binarize' ('none' without steps)."""
+        return '+'.join(self.steps) or 'none'
+
+    def _output(self, name, shape, final):
+        # The last step allocates, so the caller may keep the result.
+        if final or self.pool is None:
+            return np.empty(shape, dtype=np.uint8)
+        return self.pool.get(name, shape)
+
+    def _scaled_size(self, image):
+        return int(image.shape[1] * self.scale_factor), int(image.shape[0] * self.scale_factor)
+
+    def apply_step(self, step, image):
+        """Returns `image` after one step of the pipeline, as a new array."""
+        return self._apply(step, image, True)
+
+    def _apply(self, step, image, final):
+        if step == 'grayscale':
+            if image.ndim == 2:
+                return image.copy() if final else image
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._output('grayscale', image.shape[:2], final))
+        if step == 'rescale':
+            width, height = self._scaled_size(image)
+            dst = self._output('rescale', (height, width) + image.shape[2:], final)
+            return cv2.resize(image, (width, height), dst=dst, interpolation=cv2.INTER_CUBIC)
+        # 'binarize', converting to grayscale first if an earlier step has not.
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._output('binarize_gray', image.shape[:2], False))
+        return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     BINARIZE_BLOCK_SIZE, BINARIZE_C,
+                                     dst=self._output('binarize', image.shape, final))
+
+    def __call__(self, image, profiler=NULL_PROFILER, filename=None):
+        """Returns the pre-processed crop. Without steps the crop itself is returned."""
+        if image.size == 0:
+            return image
+        last = len(self.steps) - 1
+        for index, step in enumerate(self.steps):
+            with profiler.stage(step, filename):
+                image = self._apply(step, image, index == last)
+        return image
+
+    def process(self, crops, profiler=NULL_PROFILER, filename=None):
+        """Returns the pre-processed crops, in order, batched if the pipeline was built with `batch`."""
+        if self.batch:
+            return self.process_batch(crops, profiler=profiler, filename=filename)
+        return [self(crop, profiler=profiler, filename=filename) for crop in crops]
+
+    def _can_batch(self):
+        # Crops keep integer positions on the rescaled canvas only for whole scale factors.
+        return 'rescale' not in self.steps or float(self.scale_factor).is_integer()
+
+    def _build_canvas(self, images, padding):
+        """Stacks the images vertically, each with a replicated border. Returns (canvas, rects)."""
+        width = max(image.shape[1] for image in images) + 2 * padding
+        height = sum(image.shape[0] + 2 * padding for image in images)
+        canvas = self._output('canvas', (height, width) + images[0].shape[2:], False)
+        rects, top = [], 0
+        for image in images:
+            h, w = image.shape[:2]
+            cv2.copyMakeBorder(image, padding, padding, padding, width - w - padding, cv2.BORDER_REPLICATE,
+                               dst=canvas[top:top + h + 2 * padding])
+            rects.append((top + padding, padding, h, w))
+            top += h + 2 * padding
+        return canvas, rects
+
+    def process_batch(self, crops, profiler=NULL_PROFILER, filename=None):
+        """
+        Returns the pre-processed crops, in order, running each step once over
+        all of them. Crops with different channel counts, and pipelines with a
+        fractional scale factor, are processed one by one. Building and cutting
+        up the canvas is timed as part of the first and last step.
+        """
+        crops = list(crops)
+        batchable = [crop for crop in crops if crop.size]
+        if (len(batchable) < 2 or not self.steps or not self._can_batch()
+                or len({crop.ndim for crop in batchable}) > 1):
+            return [self(crop, profiler=profiler, filename=filename) for crop in crops]
+
+        with profiler.stage(self.steps[0], filename):
+            canvas, rects = self._build_canvas(batchable, BATCH_PADDING)
+        border_is_valid = True
+        for index, step in enumerate(self.steps):
+            with profiler.stage(step, filename):
+                if index and step != 'grayscale' and not border_is_valid:
+                    # After a neighbourhood step the border no longer replicates the crop's edge; rebuild it.
+                    canvas, rects = self._build_canvas([canvas[y:y + h, x:x + w] for y, x, h, w in rects],
+                                                       BATCH_PADDING)
+                    border_is_valid = True
+                canvas = self._apply(step, canvas, False)
+                if step == 'rescale':
+                    factor = int(self.scale_factor)
+                    rects = [(y * factor, x * factor, h * factor, w * factor) for y, x, h, w in rects]
+                border_is_valid = step == 'grayscale' and border_is_valid
+                if index == len(self.steps) - 1:
+                    results = iter([canvas[y:y + h, x:x + w].copy() for y, x, h, w in rects])
+        return [next(results) if crop.size else crop for crop in crops]
@@ -0,0 +1,122 @@
+# previews.py
+import hashlib
+import os
+import shutil
+import uuid
+import cv2
+import numpy as np
+from crop_engine import CropEngine
+from dataset import coords_array
+from adaptive import rotated_recrop
+from preprocessing import PreprocessingPipeline
+from run_ocr import rescale_image, binarize_image
+
+# Longest side of the image thumbnails shown in the results viewer. Boxes are
+# drawn in percentages, so they line up with the thumbnail as with the original.
+THUMBNAIL_MAX_SIDE = 1280
+THUMBNAIL_JPEG_QUALITY = 85
+# Previews belong to one run and never change, so browsers may keep them this long.
+PREVIEW_MAX_AGE = 30 * 24 * 3600
+
+
+def processed_crop(engine, pixel_box, rotation, crop, preprocessing, ocr_path=None):
+    """
+    Returns `crop`, the crop of the pixel (x, y, w, h) box `pixel_box` rotated
+    by `rotation` degrees, pre-processed the way run_ocr passed it to Tesseract:
+    through the run's PreprocessingPipeline, or along the box's accepted
+    `ocr_path` (e.g. 'rescale+binarize') in adaptive mode. In stitched mode this
+    is the crop as it was placed on the canvas.
+    """
+    if ocr_path is not None:
+        steps = ocr_path.split('+')
+        image = rotated_recrop(engine, pixel_box, rotation) if 'rotate' in steps else crop
+        if 'rescale' in steps:
+            image = rescale_image(image)
+        if 'binarize' in steps:
+            image = binarize_image(image)
+        return image
+    return preprocessing(crop)
+
+
+def thumbnail(image, max_side=THUMBNAIL_MAX_SIDE):
+    """Downsizes an image so its longest side is at most `max_side`; smaller images are kept as is."""
+    scale = max_side / max(image.shape[:2])
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+class PreviewStore:
+    """
+    Box crops, pre-processed crops and a thumbnail of every image of a run,
+    rendered once into <root>/<job_id>/<image key>/ and served from disk by
+    app.py. Each image's previews are written into a temporary folder that is
+    renamed into place, so a preview is either complete or absent.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(root, exist_ok=True)
+
+    def _image_dir(self, job_id, filename):
+        # Filenames may contain characters (or path separators) unfit for a folder name.
+        return os.path.join(self.root, job_id, hashlib.sha1(filename.encode('utf-8')).hexdigest()[:20])
+
+    def path(self, job_id, filename, box_index=None, processed=False):
+        """Path of the thumbnail (no `box_index`) or of one box's (pre-processed) crop."""
+        if box_index is None:
+            name = 'thumbnail.jpg'
+        else:
+            name = f"box-{box_index}{'-processed' if processed else ''}.png"
+        return os.path.join(self._image_dir(job_id, filename), name)
+
+    def has_image(self, job_id, filename):
+        return os.path.isdir(self._image_dir(job_id, filename))
+
+    def render_image(self, job_id, image_path, filename, boxes, preprocessing=None, apply_deskew=False):
+        """
+        Renders the previews of one image from its boxes (as OCR'd, in order),
+        pre-processing the crops with `preprocessing` (by default binarization
+        only, like run_ocr). Returns False if the image cannot be read.
+        """
+        preprocessing = preprocessing or PreprocessingPipeline.from_flags()
+        target = self._image_dir(job_id, filename)
+        if os.path.isdir(target):
+            return True
+        try:
+            with open(image_path, 'rb') as f:
+                image = cv2.imdecode(np.frombuffer(f.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+        except OSError:
+            return False
+        if image is None:
+            return False
+
+        staging = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(staging)
+        try:
+            cv2.imwrite(os.path.join(staging, 'thumbnail.jpg'), thumbnail(image),
+                        [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_JPEG_QUALITY])
+            engine = CropEngine(image, apply_deskew=apply_deskew)
+            coords = coords_array(boxes)
+            pixel_boxes = engine.pixel_boxes(coords).tolist()
+            for index, (box, pixel_box, rotation) in enumerate(zip(boxes, pixel_boxes, coords[:, 4].tolist())):
+                crop, _ = engine.crop_pixels(pixel_box, rotation)
+                if crop.size == 0:
+                    continue
+                cv2.imwrite(os.path.join(staging, f'box-{index}.png'), crop)
+                processed = processed_crop(engine, pixel_box, rotation, crop, preprocessing,
+                                           ocr_path=box.get('ocr_path'))
+                if processed.size:
+                    cv2.imwrite(os.path.join(staging, f'box-{index}-processed.png'), processed)
+            os.replace(staging, target)
+        except OSError:
+            # Another request rendered the same image first; keep its copy.
+            if not os.path.isdir(target):
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return True
+
+    def delete_run(self, job_id):
+        shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
@@ -0,0 +1,205 @@
+# profiling.py
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages in the order they run, used to order reports.
+STAGES = ('parse', 'decode', 'deskew', 'crop', 'cache', 'grayscale', 'rescale', 'binarize', 'ocr',
+          'evaluate', 'preview', 'wait_for_image', 'wait_for_ocr')
+
+
+class RunProfiler:
+    """
+    Records wall time and call counts per pipeline stage and per image, and keeps
+    the slowest images and boxes. Recording a stage costs two perf_counter calls
+    and a few dict updates, so it is cheap enough to leave on.
+
+    Worker processes record into their own profiler and send snapshot() back to
+    the parent, which combines them with merge(). Threads (e.g. the prefetch
+    threads of prefetch.py) can record into a shared profiler directly.
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.started_at = time.time()
+        self.stages = {}          # stage -> [calls, total seconds, max seconds]
+        self.images = {}          # filename -> {stage: seconds}
+        self.slowest_boxes = []   # min-heap of (seconds, filename, box index)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def stage(self, name, filename=None):
+        """Times the enclosed block as one call of `name`, attributed to `filename`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, filename)
+
+    def record(self, name, seconds, filename=None, calls=1):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = [0, 0.0, 0.0]
+            stats[0] += calls
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+            if filename is not None:
+                image_stages = self.images.get(filename)
+                if image_stages is None:
+                    image_stages = self.images[filename] = {}
+                image_stages[name] = image_stages.get(name, 0.0) + seconds
+
+    def record_box(self, filename, box_index, seconds):
+        """Tracks the total processing time of one box for the slowest-box report."""
+        entry = (seconds, filename, box_index)
+        with self._lock:
+            if len(self.slowest_boxes) < self.top_n:
+                heapq.heappush(self.slowest_boxes, entry)
+            elif entry > self.slowest_boxes[0]:
+                heapq.heapreplace(self.slowest_boxes, entry)
+
+    def timed_iter(self, name, iterable):
+        """Yields from `iterable`, recording the time spent producing each item as `name`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name, time.perf_counter() - start)
+            yield item
+
+    def snapshot(self):
+        """Returns the recorded data as plain, picklable structures."""
+        return {
+            'stages': {name: list(stats) for name, stats in self.stages.items()},
+            'images': {filename: dict(stages) for filename, stages in self.images.items()},
+            'slowest_boxes': list(self.slowest_boxes),
+        }
+
+    def merge(self, snapshot):
+        """Adds a snapshot from another profiler (e.g. a worker process) into this one."""
+        if not snapshot:
+            return
+        with self._lock:
+            for name, (calls, total, longest) in snapshot['stages'].items():
+                stats = self.stages.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += calls
+                stats[1] += total
+                stats[2] = max(stats[2], longest)
+            for filename, stages in snapshot['images'].items():
+                image_stages = self.images.setdefault(filename, {})
+                for name, seconds in stages.items():
+                    image_stages[name] = image_stages.get(name, 0.0) + seconds
+            for seconds, filename, box_index in snapshot['slowest_boxes']:
+                self.record_box(filename, box_index, seconds)
+
+    def slowest_images(self, n=None):
+        """Returns [(filename, total seconds, per-stage seconds)] for the slowest images."""
+        totals = [(sum(stages.values()), filename, stages) for filename, stages in self.images.items()]
+        slowest = heapq.nlargest(n or self.top_n, totals)
+        return [(filename, total, stages) for total, filename, stages in slowest]
+
+    def to_dict(self):
+        """Returns the JSON run profile."""
+        ordered = sorted(self.stages, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES))
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': time.time() - self.started_at,
+            'images_profiled': len(self.images),
+            'stages': {
+                name: {
+                    'calls': self.stages[name][0],
+                    'total_seconds': self.stages[name][1],
+                    'mean_seconds': self.stages[name][1] / self.stages[name][0] if self.stages[name][0] else 0.0,
+                    'max_seconds': self.stages[name][2],
+                }
+                for name in ordered
+            },
+            'slowest_images': [
+                {'filename': filename, 'total_seconds': total, 'stages': stages}
+                for filename, total, stages in self.slowest_images()
+            ],
+            'slowest_boxes': [
+                {'filename': filename, 'box_index': box_index, 'seconds': seconds}
+                for seconds, filename, box_index in sorted(self.slowest_boxes, reverse=True)
+            ],
+        }
+
+    def to_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def to_prometheus(self, prefix='ocr_eval'):
+        """Returns the stage counters in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats[1]:.6f}'
+                  for name, stats in self.stages.items()]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Number of calls of each pipeline stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {stats[0]}'
+                  for name, stats in self.stages.items()]
+        lines += [
+            f"# HELP {prefix}_stage_max_seconds Longest single call of each pipeline stage.",
+            f"# TYPE {prefix}_stage_max_seconds gauge",
+        ]
+        lines += [f'{prefix}_stage_max_seconds{{stage="{name}"}} {stats[2]:.6f}'
+                  for name, stats in self.stages.items()]
+        lines += [
+            f"# HELP {prefix}_images_total Number of images profiled.",
+            f"# TYPE {prefix}_images_total counter",
+            f"{prefix}_images_total {len(self.images)}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Returns a short human-readable report of the stage times and slowest images."""
+        profile = self.to_dict()
+        lines = [f"{'stage':<14} {'calls':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, stats in profile['stages'].items():
+            lines.append(f"{name:<14} {stats['calls']:>8} {stats['total_seconds']:>10.3f} "
+                         f"{stats['mean_seconds'] * 1000:>10.2f} {stats['max_seconds'] * 1000:>10.2f}")
+        if profile['slowest_images']:
+            lines.append("Slowest images:")
+            lines += [f"  {entry['filename']}: {entry['total_seconds']:.3f}s" for entry in profile['slowest_images']]
+        if profile['slowest_boxes']:
+            lines.append("Slowest boxes:")
+            lines += [f"  {entry['filename']} box {entry['box_index']}: {entry['seconds'] * 1000:.1f}ms"
+                      for entry in profile['slowest_boxes']]
+        return '\n'.join(lines)
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every method is a no-op."""
+
+    @contextmanager
+    def stage(self, name, filename=None):
+        yield
+
+    def record(self, name, seconds, filename=None, calls=1):
+        pass
+
+    def record_box(self, filename, box_index, seconds):
+        pass
+
+    def timed_iter(self, name, iterable):
+        return iterable
+
+    def snapshot(self):
+        return None
+
+    def merge(self, snapshot):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
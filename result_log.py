@@ -0,0 +1,212 @@
+# result_log.py
+import csv
+import hashlib
+import json
+import os
+from evaluate import EvaluationAccumulator, box_rows
+
+# Columns of the per-box CSV. The adaptive OCR mode adds the path it took per box.
+BOX_REPORT_COLUMNS = ['Image Filename', 'Box Index', 'Ground Truth', 'OCR Text', 'WER (%)', 'CER (%)']
+ADAPTIVE_BOX_REPORT_COLUMNS = ['OCR Path', 'OCR Confidence', 'OCR Attempts']
+
+
+class SettingsMismatchError(Exception):
+    """Raised when resuming or merging result logs that were written with different settings."""
+
+
+def parse_shard(text):
+    """Parses a 'k/n' shard spec (1 <= k <= n) into the tuple (k, n)."""
+    index, count = (int(part) for part in text.split('/'))
+    if not 1 <= index <= count:
+        raise ValueError(f"shard must be k/n with 1 <= k <= n, got '{text}'")
+    return index, count
+
+
+def shard_of(filename, shard_count):
+    """
+    Returns the 1-based shard an image belongs to. Based on a hash of the
+    filename, so every node assigns every image the same way regardless of the
+    export order, and Python's per-process hash randomization does not matter.
+    """
+    digest = hashlib.sha1(filename.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count + 1
+
+
+def shard_path(path, shard):
+    """Inserts the shard into a file name: out.jsonl -> out.shard-2-of-4.jsonl."""
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
+
+
+def _complete_lines(path):
+    """
+    Yields (end offset, decoded record) for every complete JSON line of the log.
+    Stops at the first torn or unreadable line, which is what a crash mid-write
+    leaves behind.
+    """
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield offset, record
+
+
+def iter_result_log(path):
+    """Yields the image records of a result log one at a time, ignoring a torn last line."""
+    for _, record in _complete_lines(path):
+        if record.get('type') != 'header':
+            yield record
+
+
+def read_log_header(path):
+    """Returns the header of a result log ({'settings': ..., 'shard': [k, n] or None}), or None."""
+    for _, record in _complete_lines(path):
+        return record if record.get('type') == 'header' else None
+    return None
+
+
+class ResultLog:
+    """
+    Append-only JSONL log of evaluated images. The first line holds the run
+    settings; every following line is one image with its report row, its
+    additive error counts and its boxes (OCR text and per-box metrics), so a
+    log is also the partial report of one shard of a run (see
+    merge_result_logs). Each
+    line is flushed and fsynced as soon as the image is done, so a crash or
+    Ctrl-C loses at most the image in progress.
+
+    With `resume=True` an existing log is reopened: the report row and counts
+    of every logged image are kept in `completed` (filename -> (row, counts))
+    so those images can be skipped, and new images are appended after the last
+    complete line. Raises SettingsMismatchError if the log was written with
+    different settings, since mixing them would corrupt the aggregate.
+    """
+
+    def __init__(self, path, settings, resume=False, shard=None):
+        self.path = path
+        self.completed = {}
+        header = {'type': 'header', 'settings': settings, 'shard': list(shard) if shard else None}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume and os.path.exists(path):
+            valid_end = 0
+            logged_header = None
+            for valid_end, record in _complete_lines(path):
+                if record.get('type') == 'header':
+                    logged_header = record
+                else:
+                    self.completed[record['filename']] = (record['row'], record['counts'])
+            if logged_header is not None and logged_header != header:
+                raise SettingsMismatchError(
+                    f"'{path}' was written with different settings: {logged_header['settings']} "
+                    f"(shard {logged_header.get('shard')})")
+            self._file = open(path, 'r+b')
+            # Drop a line torn by a crash so the next record starts on a fresh line.
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+            if logged_header is None:
+                self._write(header)
+        else:
+            self._file = open(path, 'wb')
+            self._write(header)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, filename, row, counts, boxes, image=None, task=None):
+        """
+        Logs one evaluated image. `image` is the image file's signature and `task`
+        its Label Studio task and annotation ids, used by incremental runs to
+        tell what changed (see incremental.plan_image).
+        """
+        record = {'filename': filename, 'row': row, 'counts': counts, 'boxes': boxes}
+        if image is not None:
+            record['image'] = image
+        if task is not None:
+            record['task'] = task
+        self._write(record)
+
+    def close(self):
+        self._file.close()
+
+
+def iter_merged_records(paths):
+    """
+    Yields the image records of several result logs in order. An image present
+    in more than one log (e.g. a shard that was run twice with different
+    shard counts) is only yielded from the first.
+    """
+    seen = set()
+    for path in paths:
+        for record in iter_result_log(path):
+            if record['filename'] not in seen:
+                seen.add(record['filename'])
+                yield record
+
+
+def merge_result_logs(paths):
+    """
+    Combines partial result logs, e.g. the shard logs of a run spread over
+    several machines, into one EvaluationAccumulator. The aggregate is computed
+    from the summed error counts, so it is exactly the corpus-level WER/CER of
+    a single run over all images. Raises SettingsMismatchError if the logs were
+    written with different settings, and prints a warning for duplicate images
+    and for shards missing from the set.
+    """
+    headers = {path: read_log_header(path) for path in paths}
+    settings = None
+    for path, header in headers.items():
+        if header is None:
+            raise SettingsMismatchError(f"'{path}' is not a result log")
+        if settings is None:
+            settings = header['settings']
+        elif header['settings'] != settings:
+            raise SettingsMismatchError(
+                f"'{path}' was written with different settings: {header['settings']}")
+
+    shard_counts = {header['shard'][1] for header in headers.values() if header['shard']}
+    for count in shard_counts:
+        present = {header['shard'][0] for header in headers.values()
+                   if header['shard'] and header['shard'][1] == count}
+        missing = sorted(set(range(1, count + 1)) - present)
+        if missing:
+            print(f"  Warning: shards {missing} of {count} are missing; the report covers only the others.")
+
+    accumulator = EvaluationAccumulator()
+    duplicates = 0
+    seen = set()
+    for path in paths:
+        for record in iter_result_log(path):
+            if record['filename'] in seen:
+                duplicates += 1
+                continue
+            seen.add(record['filename'])
+            accumulator.add_row(record['row'], record['counts'])
+    if duplicates:
+        print(f"  Warning: {duplicates} images appear in more than one log; the first occurrence is used.")
+    return accumulator, settings
+
+
+def write_box_report(records, csv_path, adaptive=False):
+    """
+    Writes the per-box CSV from result log records one image at a time, so the
+    boxes of the whole run are never held in memory together.
+    """
+    columns = BOX_REPORT_COLUMNS + (ADAPTIVE_BOX_REPORT_COLUMNS if adaptive else [])
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval='', extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerows(box_rows(record['filename'], record['boxes']))
@@ -0,0 +1,156 @@
+# result_store.py
+import json
+import os
+import sqlite3
+import threading
+
+# Columns the results API may sort by, mapped to their SQL expressions.
+IMAGE_SORT_COLUMNS = {
+    'filename': 'filename', 'word_count': 'word_count', 'char_count': 'char_count',
+    'wer': 'wer', 'cer': 'cer', 'boxes': 'box_count',
+}
+BOX_SORT_COLUMNS = {
+    'filename': 'filename, box_index', 'box_index': 'box_index', 'wer': 'wer', 'cer': 'cer',
+}
+# Largest page the results API returns in one response.
+MAX_PAGE_SIZE = 1000
+
+
+class ResultStore:
+    """
+    Indexed SQLite store of evaluation results, one row per image and per box,
+    keyed by job id. Evaluation jobs add images as they finish, and the web app
+    reads sorted, filtered pages back (e.g. the 50 worst images by CER) without
+    loading a whole run. Each thread opens its own connection; the database runs
+    in WAL mode so pages can be read while a job is still writing.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                conn.executescript(
+                    'CREATE TABLE IF NOT EXISTS runs ('
+                    ' job_id TEXT PRIMARY KEY, aggregate TEXT);'
+                    'CREATE TABLE IF NOT EXISTS images ('
+                    ' job_id TEXT NOT NULL, filename TEXT NOT NULL, word_count INTEGER, char_count INTEGER,'
+                    ' wer REAL, cer REAL, box_count INTEGER, PRIMARY KEY (job_id, filename));'
+                    'CREATE INDEX IF NOT EXISTS idx_images_wer ON images (job_id, wer);'
+                    'CREATE INDEX IF NOT EXISTS idx_images_cer ON images (job_id, cer);'
+                    'CREATE TABLE IF NOT EXISTS boxes ('
+                    ' job_id TEXT NOT NULL, filename TEXT NOT NULL, box_index INTEGER NOT NULL,'
+                    ' gt_text TEXT, ocr_text TEXT, wer REAL, cer REAL, coords TEXT, extra TEXT,'
+                    ' PRIMARY KEY (job_id, filename, box_index));'
+                    'CREATE INDEX IF NOT EXISTS idx_boxes_wer ON boxes (job_id, wer);'
+                    'CREATE INDEX IF NOT EXISTS idx_boxes_cer ON boxes (job_id, cer);'
+                )
+            self._local.conn = conn
+        return conn
+
+    def add_image(self, job_id, row, boxes):
+        """Stores one scored image: its report row and its boxes (with 'wer'/'cer')."""
+        filename = row['Image Filename']
+        box_records = []
+        for index, box in enumerate(boxes):
+            # Anything beyond the common fields, e.g. the adaptive mode's path and confidence.
+            extra = {key: value for key, value in box.items()
+                     if key not in ('coords', 'gt_text', 'ocr_text', 'wer', 'cer')}
+            box_records.append((job_id, filename, index, box['gt_text'], box['ocr_text'],
+                                box.get('wer'), box.get('cer'), json.dumps(box['coords']), json.dumps(extra)))
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (job_id, filename, int(row['Word Count (GT)']), int(row['Character Count (GT)']),
+                          float(row['WER (%)']), float(row['CER (%)']), len(boxes)))
+            conn.executemany('INSERT OR REPLACE INTO boxes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', box_records)
+
+    def finish_run(self, job_id, aggregate):
+        """Records the aggregate row of a finished run."""
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?)', (job_id, json.dumps(aggregate)))
+
+    def has_run(self, job_id):
+        return self._connect().execute('SELECT 1 FROM runs WHERE job_id = ?', (job_id,)).fetchone() is not None
+
+    def delete_run(self, job_id):
+        conn = self._connect()
+        with conn:
+            for table in ('runs', 'images', 'boxes'):
+                conn.execute(f'DELETE FROM {table} WHERE job_id = ?', (job_id,))
+
+    def _page(self, table, columns, job_id, filters, params, sort_sql, descending, limit, offset):
+        """Runs a filtered count plus one sorted page and returns (total, rows)."""
+        where = ' AND '.join(['job_id = ?'] + filters)
+        params = [job_id] + params
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+        direction = 'DESC' if descending else 'ASC'
+        order = ', '.join(f'{column} {direction}' for column in sort_sql.split(', '))
+        rows = conn.execute(f'SELECT {columns} FROM {table} WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?',
+                            params + [limit, offset]).fetchall()
+        return total, rows
+
+    def query_images(self, job_id, sort='filename', descending=False, search=None,
+                     min_wer=None, min_cer=None, limit=50, offset=0):
+        """
+        Returns (total matching images, one page of image dicts). `search` keeps
+        filenames containing the text; `min_wer`/`min_cer` keep images at or above
+        an error rate. Raises ValueError for an unknown sort column.
+        """
+        if sort not in IMAGE_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort images by '{sort}'.")
+        filters, params = [], []
+        if search:
+            filters.append("filename LIKE ? ESCAPE '\\'")
+            params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        for column, minimum in (('wer', min_wer), ('cer', min_cer)):
+            if minimum is not None:
+                filters.append(f'{column} >= ?')
+                params.append(minimum)
+        total, rows = self._page('images', 'filename, word_count, char_count, wer, cer, box_count',
+                                 job_id, filters, params, IMAGE_SORT_COLUMNS[sort], descending, limit, offset)
+        return total, [dict(row) for row in rows]
+
+    def query_boxes(self, job_id, sort='filename', descending=False, filename=None,
+                    min_wer=None, min_cer=None, limit=50, offset=0):
+        """
+        Returns (total matching boxes, one page of box dicts in the shape of the
+        OCR results: coords, gt_text, ocr_text, wer, cer and any extra fields).
+        Raises ValueError for an unknown sort column.
+        """
+        if sort not in BOX_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort boxes by '{sort}'.")
+        filters, params = [], []
+        if filename is not None:
+            filters.append('filename = ?')
+            params.append(filename)
+        for column, minimum in (('wer', min_wer), ('cer', min_cer)):
+            if minimum is not None:
+                filters.append(f'{column} >= ?')
+                params.append(minimum)
+        total, rows = self._page('boxes', 'filename, box_index, gt_text, ocr_text, wer, cer, coords, extra',
+                                 job_id, filters, params, BOX_SORT_COLUMNS[sort], descending, limit, offset)
+        boxes = []
+        for row in rows:
+            box = json.loads(row['extra'])
+            box.update(filename=row['filename'], box_index=row['box_index'], coords=json.loads(row['coords']),
+                       gt_text=row['gt_text'], ocr_text=row['ocr_text'], wer=row['wer'], cer=row['cer'])
+            boxes.append(box)
+        return total, boxes
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,8 +1,26 @@
 # run_ocr.py
+import hashlib
+import json
 import os
-import pytesseract
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
+from ocr_backends import get_backend, resolve_backend_name
+from profiling import NULL_PROFILER, RunProfiler
+from prefetch import iter_prefetched, new_queue_stats
+from stitching import STITCHED_PSM, plan_canvases, recognize_canvas
+from crop_engine import CropEngine, SKEW_ESTIMATE_MAX_SIDE
+from preprocessing import DEFAULT_ORDER, PreprocessingPipeline
+from adaptive import CASCADE, DEFAULT_CONFIDENCE_THRESHOLD, mean_confidence, rotated_recrop, words_to_text
+from dataset import ImageAnnotations, coords_array
+
+# 'per_crop' makes one Tesseract call per box; 'stitched' one call per image (see stitching.py);
+# 'adaptive' escalates each box through more pre-processing only when needed (see adaptive.py).
+OCR_MODES = ('per_crop', 'stitched', 'adaptive')
+# Prefix of the fields a comparison OCR mode adds to each box, e.g. compare_ocr_text.
+COMPARE_PREFIX = 'compare_'
 
 # --- Pre-processing Functions ---
 def rescale_image(image, scale_factor=2.0):
@@ -42,68 +60,538 @@ def deskew_image(image):
                              flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
     return rotated
 
-def run_ocr_on_boxes(image_dir, ground_truth_data, psm=7, oem=3, lang='eng', 
-                     apply_rescaling=False, apply_binarization=True, apply_deskew=False):
+def _box_to_pixels(coords, image_width, image_height):
+    """Converts Label Studio percentage coordinates into a pixel (x, y, w, h) box."""
+    x = int(coords['x'] * image_width / 100)
+    y = int(coords['y'] * image_height / 100)
+    w = int(coords['width'] * image_width / 100)
+    h = int(coords['height'] * image_height / 100)
+    return x, y, w, h
+
+def _load_image(image_path, apply_deskew=False, profiler=NULL_PROFILER, filename=None):
     """
-    Takes parsed ground truth data, runs OCR on each bounding box, and returns the
-    enriched data structure with the ocr_text added. Includes optional pre-processing.
+    Reads an image from disk and prepares a CropEngine for its boxes, estimating
+    the skew when `apply_deskew` is set. Returns the engine and the SHA-256 of
+    the file contents (used by the OCR cache), or (None, None) if the image
+    cannot be read.
+    """
+    with profiler.stage('decode', filename):
+        try:
+            with open(image_path, 'rb') as f:
+                file_bytes = f.read()
+        except OSError:
+            # Unreadable, or deleted since it was listed; skipped like an undecodable image.
+            return None, None
+        image_digest = hashlib.sha256(file_bytes).hexdigest()
+        full_image = cv2.imdecode(np.frombuffer(file_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if full_image is None:
+        return None, None
+
+    if not apply_deskew:
+        return CropEngine(full_image), image_digest
+    # The skew is measured on a downsampled copy; only the box regions are warped later.
+    with profiler.stage('deskew', filename):
+        engine = CropEngine(full_image, apply_deskew=True)
+    return engine, image_digest
+
+def _recognize_adaptive(engine, pixel_box, rotation, crop, backend, confidence_threshold,
+                        profiler=NULL_PROFILER, filename=None):
+    """
+    Runs the adaptive.CASCADE on `crop`, the crop of the pixel (x, y, w, h)
+    box `pixel_box` rotated by `rotation` degrees, until a path reaches
+    `confidence_threshold`. Returns the fields to store on the box: ocr_text,
+    ocr_path (the steps of the accepted path joined by '+'), ocr_confidence
+    and ocr_attempts. When no path is confident enough, the most confident
+    result wins.
+    """
+    best = None
+    rotated = None
+    for attempt, path in enumerate(CASCADE, start=1):
+        image = crop
+        for step in path:
+            if step == 'rotate':
+                if rotated is None:
+                    with profiler.stage('deskew', filename):
+                        rotated = rotated_recrop(engine, pixel_box, rotation)
+                image = rotated
+            elif step == 'rescale':
+                with profiler.stage('rescale', filename):
+                    image = rescale_image(image)
+            elif step == 'binarize':
+                with profiler.stage('binarize', filename):
+                    image = binarize_image(image)
+
+        with profiler.stage('ocr', filename):
+            words = backend.image_to_data(image)
+        confidence = mean_confidence(words)
+        if best is None or confidence > best['ocr_confidence']:
+            best = {'ocr_text': words_to_text(words).strip(), 'ocr_path': '+'.join(path),
+                    'ocr_confidence': round(confidence, 2)}
+        if confidence >= confidence_threshold:
+            break
+
+    best['ocr_attempts'] = attempt
+    return best
+
+def _ocr_boxes(engine, coords, filename, backend,
+               apply_rescaling=False, apply_binarization=True,
+               cache=None, image_digest=None, cache_signature=None,
+               profiler=NULL_PROFILER, first_box_index=0, ocr_mode='per_crop',
+               confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD, preprocessing=None):
+    """
+    Runs OCR on every box of an already loaded image, given as its CropEngine,
+    and returns, in the same order as the boxes, the fields to add to each box
+    (at least ocr_text). `coords` is the (n, 5) coordinate array of the boxes
+    (see dataset.coords_array); they are converted to pixels in one step. When a cache is given, boxes whose result is already
+    cached for this image and these settings skip Tesseract.
+
+    In 'per_crop' mode every crop is a separate Tesseract call. In 'stitched'
+    mode the crops are packed into composite canvases and recognized with one
+    call per canvas (see stitching.py). `coords` must then hold all boxes of the
+    image, and the cache holds the image as a whole, keyed on its full box
+    set, so the canvases never depend on what happens to be cached. In
+    'adaptive' mode the rescaling/binarization flags are ignored and every
+    crop escalates through adaptive.CASCADE until its word confidence reaches
+    `confidence_threshold`; the path taken is recorded on the box.
+
+    `preprocessing` is the preprocessing.PreprocessingPipeline applied to the
+    crops of the other modes; by default it is built from the apply_* flags.
+    A pipeline built with `batch` pre-processes all crops of the image at once.
+    """
+    if preprocessing is None:
+        preprocessing = PreprocessingPipeline.from_flags(apply_rescaling, apply_binarization)
+    with profiler.stage('crop', filename):
+        pixel_boxes = engine.pixel_boxes(coords).tolist()
+        rotations = coords[:, 4].tolist()
+
+    image_key = None
+    if cache is not None and ocr_mode == 'stitched':
+        lookup_start = time.perf_counter()
+        with profiler.stage('cache', filename):
+            box_keys = [engine.pixel_box_map(pixel_box, rotation)[2]
+                        for pixel_box, rotation in zip(pixel_boxes, rotations)]
+            image_key = cache.make_image_key(image_digest, box_keys, cache_signature)
+            cached_texts = cache.get(image_key)
+        if cached_texts is not None:
+            lookup_share = (time.perf_counter() - lookup_start) / max(len(pixel_boxes), 1)
+            for position in range(len(pixel_boxes)):
+                profiler.record_box(filename, first_box_index + position, lookup_share)
+            cache.flush()
+            return [{'ocr_text': text} for text in json.loads(cached_texts)]
+
+    results = [None] * len(pixel_boxes)
+    pending = []   # (position, processed crop, cache key, pre-processing seconds)
+    for position, (pixel_box, rotation) in enumerate(zip(pixel_boxes, rotations)):
+        box_start = time.perf_counter()
+
+        try:
+            with profiler.stage('crop', filename):
+                cropped_image, box_key = engine.crop_pixels(pixel_box, rotation)
+            if cropped_image.size == 0:
+                results[position] = {'ocr_text': ""}
+                continue
+
+            cache_key = None
+            if cache is not None and image_key is None:
+                with profiler.stage('cache', filename):
+                    cache_key = cache.make_key(image_digest, box_key, cache_signature)
+                    cached_text = cache.get(cache_key)
+                if cached_text is not None:
+                    # Adaptive results are cached with their path and confidence.
+                    results[position] = json.loads(cached_text) if ocr_mode == 'adaptive' else {'ocr_text': cached_text}
+                    continue
+
+            processed_crop = cropped_image
+            if ocr_mode != 'adaptive' and not preprocessing.batch:
+                processed_crop = preprocessing(cropped_image, profiler=profiler, filename=filename)
+
+            pending.append((position, processed_crop, cache_key, time.perf_counter() - box_start))
+
+        except Exception as e:
+            print(f"    Error processing a region in {filename}: {e}")
+            results[position] = {'ocr_text': "[OCR_ERROR]"}
+        finally:
+            if results[position] is not None:
+                profiler.record_box(filename, first_box_index + position, time.perf_counter() - box_start)
+
+    if pending and ocr_mode != 'adaptive' and preprocessing.batch:
+        # All crops of the image go through each pre-processing step together.
+        preprocess_start = time.perf_counter()
+        try:
+            processed = preprocessing.process_batch([crop for _, crop, _, _ in pending],
+                                                    profiler=profiler, filename=filename)
+        except Exception as e:
+            print(f"    Error pre-processing the regions of {filename}: {e}")
+            for position, _, _, preprocess_seconds in pending:
+                results[position] = {'ocr_text': "[OCR_ERROR]"}
+                profiler.record_box(filename, first_box_index + position, preprocess_seconds)
+            pending = []
+        else:
+            preprocess_share = (time.perf_counter() - preprocess_start) / len(pending)
+            pending = [(position, crop, cache_key, seconds + preprocess_share)
+                       for (position, _, cache_key, seconds), crop in zip(pending, processed)]
+
+    if ocr_mode == 'stitched':
+        groups = plan_canvases([crop for _, crop, _, _ in pending])
+    else:
+        groups = [[index] for index in range(len(pending))]
+
+    for group in groups:
+        ocr_start = time.perf_counter()
+        try:
+            if ocr_mode == 'adaptive':
+                position, crop, _, _ = pending[group[0]]
+                recognized = [_recognize_adaptive(engine, pixel_boxes[position], rotations[position], crop,
+                                                  backend, confidence_threshold,
+                                                  profiler=profiler, filename=filename)]
+            else:
+                with profiler.stage('ocr', filename):
+                    if ocr_mode == 'stitched':
+                        texts = recognize_canvas(backend, [pending[index][1] for index in group])
+                    else:
+                        texts = [backend.image_to_string(pending[group[0]][1])]
+                recognized = [{'ocr_text': text.strip()} for text in texts]
+        except Exception as e:
+            print(f"    Error processing a region in {filename}: {e}")
+            recognized = None
+        # A stitched call is shared by its crops, so each is charged an equal part of it.
+        ocr_share = (time.perf_counter() - ocr_start) / len(group)
+
+        for offset, index in enumerate(group):
+            position, _, cache_key, preprocess_seconds = pending[index]
+            if recognized is None:
+                results[position] = {'ocr_text': "[OCR_ERROR]"}
+            else:
+                results[position] = recognized[offset]
+                if cache_key is not None:
+                    cache.put(cache_key, json.dumps(recognized[offset]) if ocr_mode == 'adaptive'
+                              else recognized[offset]['ocr_text'])
+            profiler.record_box(filename, first_box_index + position, preprocess_seconds + ocr_share)
+
+    if image_key is not None and all(result['ocr_text'] != "[OCR_ERROR]" for result in results):
+        cache.put(image_key, json.dumps([result['ocr_text'] for result in results]))
+    if cache is not None:
+        cache.flush()
+    return results
+
+def _ocr_image_modes(engine, coords, filename, modes, profiler=NULL_PROFILER, **settings):
+    """
+    Runs _ocr_boxes on one loaded image once per (ocr_mode, backend,
+    cache_signature) entry of `modes`, with the other `settings` shared. The
+    fields of the first mode are returned as is, those of a second mode are
+    added to them with COMPARE_PREFIX. Only the first mode is profiled.
+    """
+    results = None
+    for ocr_mode, backend, cache_signature in modes:
+        mode_results = _ocr_boxes(engine, coords, filename, backend, ocr_mode=ocr_mode,
+                                  cache_signature=cache_signature,
+                                  profiler=profiler if results is None else NULL_PROFILER, **settings)
+        if results is None:
+            results = mode_results
+            continue
+        for fields, compare_fields in zip(results, mode_results):
+            fields.update((COMPARE_PREFIX + name, value) for name, value in compare_fields.items())
+    return results
+
+def _box_coords(boxes):
+    """The (n, 5) coordinate array of a record's boxes, given as box dicts or a dataset.ImageAnnotations."""
+    return boxes.coords if isinstance(boxes, ImageAnnotations) else coords_array(boxes)
+
+def _store_results(boxes, results):
+    """Writes the per-box OCR fields returned by _ocr_boxes back into a record's boxes."""
+    if isinstance(boxes, ImageAnnotations):
+        boxes.set_ocr_results(results)
+        return
+    for box_info, fields in zip(boxes, results):
+        box_info.update(fields)
+
+def _ocr_image_task(task):
+    """
+    Process pool entry point. Loads one image and runs OCR on a slice of its boxes.
+    Returns the per-box OCR fields (None when the image cannot be read) with the
+    cache hits and misses and the profiler snapshot of this task.
+    """
+    image_path, filename, first_box_index, coords, options = task
+    profiler = RunProfiler() if options['profile'] else NULL_PROFILER
+    engine, image_digest = _load_image(image_path, apply_deskew=options['apply_deskew'],
+                                       profiler=profiler, filename=filename)
+    if engine is None:
+        return None, 0, 0, profiler.snapshot()
+
+    cache = options['cache']
+    hits_before, misses_before = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    modes = [(mode['ocr_mode'], get_backend(options['backend'], options['lang'], options['oem'], mode['psm']),
+              mode['cache_signature']) for mode in options['modes']]
+    results = _ocr_image_modes(engine, coords, filename, modes,
+                               apply_rescaling=options['apply_rescaling'],
+                               apply_binarization=options['apply_binarization'],
+                               cache=cache, image_digest=image_digest,
+                               profiler=profiler, first_box_index=first_box_index,
+                               confidence_threshold=options['confidence_threshold'],
+                               preprocessing=options['preprocessing'])
+    if cache is None:
+        return results, 0, 0, profiler.snapshot()
+    return results, cache.hits - hits_before, cache.misses - misses_before, profiler.snapshot()
+
+def _iter_parallel(image_dir, records, options, workers, boxes_per_task, max_pending_images, counters,
+                   profiler=NULL_PROFILER):
+    """
+    Runs the OCR on a process pool and yields (filename, boxes) in input order.
+    Each image becomes one task, and images with more than `boxes_per_task` boxes
+    are split into several chunks so a single box-heavy image does not hold up the
+    whole pool. At most `max_pending_images` images are in flight, so records are
+    pulled from `records` only as fast as the pool can work through them.
+    """
+    cache = options['cache']
+    print(f"  Dispatching images to {workers} worker processes...")
+
+    def collect(filename, boxes, futures):
+        # Only the coordinate arrays were sent to the workers; write the results back here.
+        image_results = []
+        for future in futures:
+            results, cache_hits, cache_misses, profile_snapshot = future.result()
+            profiler.merge(profile_snapshot)
+            if cache is not None:
+                cache.hits += cache_hits
+                cache.misses += cache_misses
+            if results is None:
+                image_results = None
+            elif image_results is not None:
+                image_results.extend(results)
+        if image_results is None:
+            return False
+        _store_results(boxes, image_results)
+        return True
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for filename, boxes in records:
+            image_path = os.path.join(image_dir, filename)
+            if not os.path.exists(image_path):
+                print(f"  [Warning] Image file not found, skipping: {image_path}")
+                continue
+            counters['processed'] += 1
+
+            coords = _box_coords(boxes)
+            step = boxes_per_task if boxes_per_task and boxes_per_task > 0 else max(len(coords), 1)
+            if any(mode['ocr_mode'] == 'stitched' for mode in options['modes']):
+                # Stitched canvases must hold the same boxes as in a single process run.
+                step = max(len(coords), 1)
+            futures = [
+                executor.submit(_ocr_image_task, (image_path, filename, start, coords[start:start + step], options))
+                for start in range(0, max(len(coords), 1), step)
+            ]
+            pending.append((filename, boxes, futures))
+
+            # Yield finished images in submission order, which keeps the output deterministic.
+            while len(pending) >= max_pending_images:
+                filename, boxes, futures = pending.popleft()
+                if collect(filename, boxes, futures):
+                    yield filename, boxes
+
+        while pending:
+            filename, boxes, futures = pending.popleft()
+            if collect(filename, boxes, futures):
+                yield filename, boxes
+
+def iter_ocr_results(image_dir, records, psm=7, oem=3, lang='eng',
+                     apply_rescaling=False, apply_binarization=True, apply_deskew=False,
+                     workers=1, boxes_per_task=32, backend='auto', cache=None,
+                     profiler=None, ocr_mode='per_crop',
+                     confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
+                     prefetch_depth=4, io_threads=2,
+                     preprocessing_order=DEFAULT_ORDER, grayscale_first=False,
+                     reuse_buffers=False, batch_crops=False, compare_mode=None):
+    """
+    Streaming version of run_ocr_on_boxes. Consumes (filename, boxes) records, for
+    example from parse_label_studio.iter_label_studio_export, and yields each
+    (filename, boxes) as soon as its OCR is done, with the ocr_text added to every
+    box. Images that are missing or cannot be read are skipped. `boxes` may also
+    be a dataset.ImageAnnotations, whose OCR results are then stored in its
+    columns (see ImageAnnotations.set_ocr_results).
+
+    With `workers` > 1 the images (or chunks of `boxes_per_task` boxes from
+    box-heavy images) are spread across a process pool. `workers=None` or 0 uses
+    every available core. The results are identical to, and in the same order
+    as, the single process run.
+
+    `backend` selects the OCR engine (see ocr_backends.py): 'tesserocr' keeps one
+    Tesseract instance loaded per worker, 'pytesseract' starts a process per crop
+    and 'auto' picks tesserocr when it is installed.
+
+    `cache` is an optional OCRCache. Boxes whose image, pixel coordinates,
+    pre-processing flags and Tesseract settings/version are unchanged since a
+    previous run are answered from the cache instead of being OCR'd again.
+
+    `profiler` is an optional profiling.RunProfiler that receives the time spent
+    decoding, deskewing, cropping, pre-processing and in Tesseract, per image
+    and per box, including the work done in worker processes.
+
+    `ocr_mode` is 'per_crop' (one Tesseract call per box, using `psm`) or
+    'stitched', which packs the crops of an image into composite canvases and
+    recognizes each canvas with one call using stitching.STITCHED_PSM.
+    'adaptive' OCRs each crop with the cheapest pre-processing first and only
+    escalates (binarize, rescale, rotated re-crop) while the mean word confidence
+    is below `confidence_threshold`; the rescaling/binarization flags are then
+    ignored and each box also gets ocr_path, ocr_confidence and ocr_attempts.
+    With a `compare_mode`, every image is also OCR'd in that mode right after,
+    from the same decoded image, and its fields are added to each box with
+    COMPARE_PREFIX (e.g. compare_ocr_text). The profiler only covers `ocr_mode`.
+
+    The rescaling and binarization of the other modes run in
+    `preprocessing_order`, optionally converting to grayscale first when the
+    crop is binarized anyway (`grayscale_first`), with reused intermediate
+    buffers (`reuse_buffers`) and batched per image (`batch_crops`); see
+    preprocessing.PreprocessingPipeline.
+
+    In a single process, up to `prefetch_depth` upcoming images are read,
+    decoded (and deskewed) on `io_threads` background threads while the current
+    one is OCR'd (see prefetch.py). `prefetch_depth=0` turns the overlap off.
     """
     print("--- Running OCR on specific bounding boxes ---")
+    profiler = profiler or NULL_PROFILER
+    for mode in (ocr_mode, compare_mode):
+        if mode is not None and mode not in OCR_MODES:
+            raise ValueError(f"Unknown OCR mode '{mode}'. Choose from: {', '.join(OCR_MODES)}")
+    if ocr_mode == 'stitched':
+        # The canvas holds many lines, so the single-line PSM of per-crop mode does not apply.
+        print(f"  Stitching the crops of each image into one canvas (PSM {STITCHED_PSM}).")
+    if compare_mode == ocr_mode:
+        compare_mode = None
+    if compare_mode is not None:
+        print(f"  Also OCR'ing every image in '{compare_mode}' mode for comparison.")
     
-    tess_config = f'--oem {oem} --psm {psm}'
+    backend = resolve_backend_name(backend)
+    print(f"  Using the '{backend}' OCR backend.")
     
-    processed_count = 0
-    for filename, data in ground_truth_data.items():
-        image_path = os.path.join(image_dir, filename)
+    if not workers:
+        workers = os.cpu_count() or 1
+
+    preprocessing = PreprocessingPipeline.from_flags(apply_rescaling, apply_binarization, order=preprocessing_order,
+                                                     grayscale_first=grayscale_first,
+                                                     reuse_buffers=reuse_buffers, batch=batch_crops)
+    # One entry per OCR mode to run: the mode, its PSM and its cache signature.
+    modes = []
+    for mode in (ocr_mode, compare_mode):
+        if mode is None:
+            continue
+        mode_psm = STITCHED_PSM if mode == 'stitched' else psm
+        cache_signature = None
+        if cache is not None:
+            cache_signature = cache.settings_signature(
+                backend=backend, tesseract_version=get_backend(backend, lang, oem, mode_psm).version(),
+                lang=lang, oem=oem, psm=mode_psm, ocr_mode=mode,
+                confidence_threshold=confidence_threshold if mode == 'adaptive' else None,
+                apply_rescaling=apply_rescaling,
+                apply_binarization=apply_binarization,
+                apply_deskew=apply_deskew,
+                skew_estimate_max_side=SKEW_ESTIMATE_MAX_SIDE if apply_deskew else None,
+                preprocessing=preprocessing.describe() if mode != 'adaptive' else None,
+            )
+        modes.append({'ocr_mode': mode, 'psm': mode_psm, 'cache_signature': cache_signature})
+
+    counters = {'processed': 0}
+    if workers > 1:
+        options = {
+            'backend': backend,
+            'lang': lang,
+            'oem': oem,
+            'modes': modes,
+            'apply_rescaling': apply_rescaling,
+            'apply_binarization': apply_binarization,
+            'apply_deskew': apply_deskew,
+            'cache': cache,
+            'profile': profiler is not NULL_PROFILER,
+            'confidence_threshold': confidence_threshold,
+            'preprocessing': preprocessing,
+        }
+        yield from _iter_parallel(image_dir, records, options, workers, boxes_per_task,
+                                  max_pending_images=workers * 4, counters=counters,
+                                  profiler=profiler)
+        _report_ocr_completion(counters['processed'], cache)
+        return
+
+    backend_modes = [(mode['ocr_mode'], get_backend(backend, lang, oem, mode['psm']), mode['cache_signature'])
+                     for mode in modes]
+
+    def load(record):
+        image_path = os.path.join(image_dir, record[0])
         if not os.path.exists(image_path):
-            print(f"  [Warning] Image file not found, skipping: {image_path}")
+            return None
+        return _load_image(image_path, apply_deskew=apply_deskew, profiler=profiler, filename=record[0])
+
+    queue_stats = new_queue_stats(prefetch_depth, io_threads)
+    for (filename, boxes), loaded in iter_prefetched(records, load, depth=prefetch_depth, threads=io_threads,
+                                                     profiler=profiler, stats=queue_stats):
+        if loaded is None:
+            print(f"  [Warning] Image file not found, skipping: {os.path.join(image_dir, filename)}")
             continue
             
-        processed_count += 1
+        counters['processed'] += 1
         print(f"  Processing {filename}...")
-        full_image = cv2.imread(image_path)
-        if full_image is None:
-            continue
-
-        # --- OPTIONAL DESKEWING OF FULL IMAGE ---
-        # Deskewing should be done on the full image before cropping.
         if apply_deskew:
             print("    - Applying deskew...")
-            full_image = deskew_image(full_image)
-        # ---
-
-        original_height, original_width, _ = full_image.shape
-
-        for box_info in data.get('boxes', []):
-            coords = box_info['coords']
-            
-            x = int(coords['x'] * original_width / 100)
-            y = int(coords['y'] * original_height / 100)
-            w = int(coords['width'] * original_width / 100)
-            h = int(coords['height'] * original_height / 100)
-
-            try:
-                cropped_image = full_image[y:y+h, x:x+w]
-                if cropped_image.size == 0:
-                    box_info['ocr_text'] = ""
-                    continue
+        engine, image_digest = loaded
+        if engine is None:
+            continue
 
-                processed_crop = cropped_image
-                
+        results = _ocr_image_modes(engine, _box_coords(boxes), filename, backend_modes,
+                                   apply_rescaling=apply_rescaling,
+                                   apply_binarization=apply_binarization,
+                                   cache=cache, image_digest=image_digest,
+                                   profiler=profiler,
+                                   confidence_threshold=confidence_threshold,
+                                   preprocessing=preprocessing)
+        _store_results(boxes, results)
+        yield filename, boxes
 
-                if apply_rescaling:
-                    processed_crop = rescale_image(processed_crop)
-                
-                if apply_binarization:
-                    processed_crop = binarize_image(processed_crop)
+    _report_queue_stats(queue_stats)
+    _report_ocr_completion(counters['processed'], cache)
 
-                
-                text = pytesseract.image_to_string(processed_crop, lang=lang, config=tess_config).strip()
-                box_info['ocr_text'] = text
+def run_ocr_on_boxes(image_dir, ground_truth_data, psm=7, oem=3, lang='eng', 
+                     apply_rescaling=False, apply_binarization=True, apply_deskew=False,
+                     workers=1, boxes_per_task=32, backend='auto', cache=None,
+                     profiler=None, ocr_mode='per_crop',
+                     confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
+                     prefetch_depth=4, io_threads=2,
+                     preprocessing_order=DEFAULT_ORDER, grayscale_first=False,
+                     reuse_buffers=False, batch_crops=False, compare_mode=None):
+    """
+    Takes parsed ground truth data, runs OCR on each bounding box, and returns the
+    enriched data structure with the ocr_text added. Includes optional pre-processing.
+    See iter_ocr_results for the parallelism, backend, cache, profiler, OCR mode, comparison mode,
+    prefetch and pre-processing options.
+    """
+    records = ((filename, data.get('boxes', [])) for filename, data in ground_truth_data.items())
+    # The boxes are updated in place, so draining the stream fills in ground_truth_data.
+    for _ in iter_ocr_results(image_dir, records, psm=psm, oem=oem, lang=lang,
+                              apply_rescaling=apply_rescaling,
+                              apply_binarization=apply_binarization,
+                              apply_deskew=apply_deskew,
+                              workers=workers, boxes_per_task=boxes_per_task,
+                              backend=backend, cache=cache, profiler=profiler,
+                              ocr_mode=ocr_mode, confidence_threshold=confidence_threshold,
+                              prefetch_depth=prefetch_depth, io_threads=io_threads,
+                              preprocessing_order=preprocessing_order, grayscale_first=grayscale_first,
+                              reuse_buffers=reuse_buffers, batch_crops=batch_crops,
+                              compare_mode=compare_mode):
+        pass
+    return ground_truth_data
 
-            except Exception as e:
-                print(f"    Error processing a region in {filename}: {e}")
-                box_info['ocr_text'] = "[OCR_ERROR]"
+def _report_queue_stats(stats):
+    """Prints how long OCR waited for images and the prefetch threads waited for OCR."""
+    if stats['depth'] <= 0 or not stats['items']:
+        return
+    print(f"Prefetch queue (depth {stats['depth']}, {stats['threads']} I/O threads): "
+          f"{stats['items']} images, at most {stats['max_depth_used']} queued; "
+          f"OCR waited {stats['consumer_wait_seconds']:.2f}s for images, "
+          f"prefetch waited {stats['producer_wait_seconds']:.2f}s for OCR.")
 
+def _report_ocr_completion(processed_count, cache):
+    """Prints the end-of-run summary, including cache statistics, and trims the cache."""
     print(f"\n--- OCR processing complete. Processed {processed_count} files. ---")
-    return ground_truth_data
+    if cache is not None:
+        stats = cache.stats()
+        evicted = cache.evict()
+        print(f"OCR cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate'] * 100:.1f}% hit rate), {evicted} entries evicted.")
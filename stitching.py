@@ -0,0 +1,101 @@
+# stitching.py
+from bisect import bisect_right
+import cv2
+import numpy as np
+
+# Stitched mode packs many pre-processed crops of one image into a single
+# composite canvas, one crop per row, and recognizes the whole canvas with one
+# Tesseract call. Each recognized word is mapped back to the crop whose row it
+# falls in.
+
+# PSM 4 ("single column of text of variable sizes") matches the canvas layout:
+# one text line per row, with the line heights of the original boxes.
+STITCHED_PSM = 4
+# Tesseract's image size limit is 32767 pixels per side; canvases are kept well
+# below it so a single recognition call stays short.
+MAX_CANVAS_HEIGHT = 8000
+# Background margin around every crop inside its row.
+CROP_PADDING = 10
+# Blank white band between rows, so lines of neighbouring crops are never merged.
+ROW_GAP = 24
+
+
+def _to_gray(crop):
+    if crop.ndim == 3:
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return crop
+
+
+def _row_height(crop, padding=CROP_PADDING, gap=ROW_GAP):
+    return crop.shape[0] + 2 * padding + gap
+
+
+def plan_canvases(crops, max_height=MAX_CANVAS_HEIGHT, padding=CROP_PADDING, gap=ROW_GAP):
+    """
+    Splits the crops into consecutive groups whose stacked rows fit within
+    `max_height`. Returns a list of index lists; a crop taller than the limit
+    gets a canvas of its own.
+    """
+    groups = []
+    current, height = [], gap
+    for index, crop in enumerate(crops):
+        row = _row_height(crop, padding, gap)
+        if current and height + row > max_height:
+            groups.append(current)
+            current, height = [], gap
+        current.append(index)
+        height += row
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_canvas(crops, padding=CROP_PADDING, gap=ROW_GAP):
+    """
+    Stacks the crops vertically on a white grayscale canvas, left-aligned, each
+    surrounded by `padding` pixels of its own background color and separated
+    by `gap` white rows. Returns the canvas and the (top, bottom) pixel span of
+    every crop's row.
+    """
+    gray_crops = [_to_gray(crop) for crop in crops]
+    width = max(crop.shape[1] for crop in gray_crops) + 2 * padding + gap
+    height = gap + sum(_row_height(crop, padding, gap) for crop in gray_crops)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+
+    spans = []
+    top = gap
+    for crop in gray_crops:
+        crop_height, crop_width = crop.shape[:2]
+        # Pad with the crop's own border color so light-on-dark crops are not
+        # framed by a white edge that Tesseract could read as a character.
+        border = np.concatenate([crop[0], crop[-1], crop[:, 0], crop[:, -1]])
+        background = int(np.median(border))
+        row_bottom = top + crop_height + 2 * padding
+        canvas[top:row_bottom, gap // 2:gap // 2 + crop_width + 2 * padding] = background
+        canvas[top + padding:top + padding + crop_height,
+               gap // 2 + padding:gap // 2 + padding + crop_width] = crop
+        spans.append((top, row_bottom))
+        top = row_bottom + gap
+    return canvas, spans
+
+
+def assign_words(words, spans):
+    """
+    Maps the words recognized on a canvas back to the rows in `spans`. A word
+    belongs to the row containing its vertical center, or the nearest row above
+    it when it falls in a gap. Returns one text per row, with the words of a
+    line joined by spaces and lines joined by newlines, like image_to_string.
+    """
+    tops = [top for top, _ in spans]
+    rows = [{} for _ in spans]   # line id -> words, in recognition order
+    for word in words:
+        center = word['top'] + word['height'] / 2
+        row = max(bisect_right(tops, center) - 1, 0)
+        rows[row].setdefault(word['line'], []).append(word['text'])
+    return ['\n'.join(' '.join(line) for line in lines.values()) for lines in rows]
+
+
+def recognize_canvas(backend, crops):
+    """Recognizes a group of crops with one Tesseract call and returns the text of each."""
+    canvas, spans = build_canvas(crops)
+    return assign_words(backend.image_to_data(canvas), spans)
@@ -0,0 +1,265 @@
+# sweep.py
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from ocr_backends import get_backend, resolve_backend_name
+from run_ocr import _load_image, _recognize_adaptive, OCR_MODES
+from crop_engine import CropEngine
+from dataset import CompactDataset, TextColumn
+from preprocessing import DEFAULT_ORDER, PreprocessingPipeline
+from adaptive import DEFAULT_CONFIDENCE_THRESHOLD
+from stitching import STITCHED_PSM, plan_canvases, recognize_canvas
+from evaluate import evaluate_tesseract_performance
+
+CONFIG_KEYS = ('psm', 'oem', 'apply_rescaling', 'apply_binarization', 'apply_deskew', 'ocr_mode')
+
+
+def expand_grid(grid):
+    """
+    Expands a grid such as {'psm': [6, 7], 'apply_rescaling': [False, True]} into
+    the list of every configuration. Settings missing from the grid use the
+    run_ocr_on_boxes defaults. Stitched configurations always use
+    stitching.STITCHED_PSM and adaptive configurations choose their own
+    rescaling/binarization, so those settings are normalized and each such
+    configuration is only listed once.
+    """
+    defaults = {'psm': [7], 'oem': [3], 'apply_rescaling': [False],
+                'apply_binarization': [True], 'apply_deskew': [False], 'ocr_mode': ['per_crop']}
+    unknown = set(grid) - set(CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sweep settings: {', '.join(sorted(unknown))}")
+    unknown_modes = set(grid.get('ocr_mode', [])) - set(OCR_MODES)
+    if unknown_modes:
+        raise ValueError(f"Unknown OCR modes: {', '.join(sorted(unknown_modes))}")
+
+    values = [grid.get(key, defaults[key]) for key in CONFIG_KEYS]
+    configs = []
+    for combination in itertools.product(*values):
+        config = dict(zip(CONFIG_KEYS, combination))
+        if config['ocr_mode'] == 'stitched':
+            config['psm'] = STITCHED_PSM
+        elif config['ocr_mode'] == 'adaptive':
+            config['apply_rescaling'] = config['apply_binarization'] = False
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def _sweep_image_task(task):
+    """
+    Runs every configuration on one image, pre-processing its crops with the
+    matching entry of `pipelines` (a preprocessing.PreprocessingPipeline per
+    configuration). The image is decoded once, its skew is estimated at most
+    once, and each box's crop and every pre-processing intermediate (e.g. the
+    rescaled crop on the way to the binarized one) are computed once and shared
+    by all configurations whose pipelines start with the same steps.
+
+    Per-crop configurations OCR each crop as soon as it is ready; stitched
+    configurations collect their crops and recognize them in composite canvases
+    once every box is pre-processed. Adaptive configurations run their own
+    cascade on the plain crop until a path reaches `confidence_threshold`, so
+    all of their time counts as OCR time.
+
+    `coords` is the (n, 5) coordinate array of the boxes; their pixel boxes are
+    computed once per image, and deskewed configurations use the same ones.
+
+    Returns the texts per configuration and, per configuration, the time spent
+    in OCR and in the pre-processing steps it depends on. Returns None when the
+    image cannot be read.
+    """
+    image_path, filename, coords, configs, pipelines, confidence_threshold, lang, backend_name = task
+
+    start = time.perf_counter()
+    engine, _ = _load_image(image_path)
+    decode_time = time.perf_counter() - start
+    if engine is None:
+        return None
+
+    # step_times[key] holds the time spent producing the intermediate `key`.
+    step_times = {('decode',): decode_time}
+    engines = {False: engine}
+    if any(config['apply_deskew'] for config in configs):
+        start = time.perf_counter()
+        engines[True] = CropEngine(engine.image, apply_deskew=True)
+        step_times[('deskew',)] = time.perf_counter() - start
+
+    texts = [[] for _ in configs]
+    ocr_times = [0.0] * len(configs)
+    preprocess_times = [0.0] * len(configs)
+    # Crops waiting for stitched recognition: config index -> [(box position, crop)].
+    stitched_crops = {index: [] for index, config in enumerate(configs) if config['ocr_mode'] == 'stitched'}
+
+    # The pixel boxes only depend on the image size, which deskewing keeps.
+    pixel_boxes = engine.pixel_boxes(coords).tolist()
+    rotations = coords[:, 4].tolist()
+    for pixel_box, rotation in zip(pixel_boxes, rotations):
+        intermediates = {}
+
+        def get_crop(deskew, pipeline, steps=None):
+            # Memoized chain keyed by the steps applied so far, e.g. () -> ('rescale',) ->
+            # ('rescale', 'binarize'), so pipelines sharing a prefix share its intermediates.
+            steps = pipeline.steps if steps is None else steps
+            key = (deskew, steps)
+            if key not in intermediates:
+                if steps:
+                    source = get_crop(deskew, pipeline, steps[:-1])
+                    start = time.perf_counter()
+                    intermediates[key] = pipeline.apply_step(steps[-1], source)
+                else:
+                    start = time.perf_counter()
+                    intermediates[key] = engines[deskew].crop_pixels(pixel_box, rotation)[0]
+                step_times[key] = step_times.get(key, 0.0) + time.perf_counter() - start
+            return intermediates[key]
+
+        for index, config in enumerate(configs):
+            deskew = config['apply_deskew']
+            try:
+                crop = get_crop(deskew, pipelines[index], ())
+                if crop.size == 0:
+                    texts[index].append("")
+                    continue
+                crop = get_crop(deskew, pipelines[index])
+                if index in stitched_crops:
+                    stitched_crops[index].append((len(texts[index]), crop))
+                    texts[index].append(None)
+                    continue
+                backend = get_backend(backend_name, lang, config['oem'], config['psm'])
+                start = time.perf_counter()
+                if config['ocr_mode'] == 'adaptive':
+                    result = _recognize_adaptive(engines[deskew], pixel_box, rotation, crop, backend,
+                                                 confidence_threshold)
+                    texts[index].append(result['ocr_text'])
+                else:
+                    texts[index].append(backend.image_to_string(crop).strip())
+                ocr_times[index] += time.perf_counter() - start
+            except Exception as e:
+                print(f"    Error processing a region in {filename}: {e}")
+                texts[index].append("[OCR_ERROR]")
+
+    for index, crops in stitched_crops.items():
+        backend = get_backend(backend_name, lang, configs[index]['oem'], STITCHED_PSM)
+        for group in plan_canvases([crop for _, crop in crops]):
+            start = time.perf_counter()
+            try:
+                recognized = [text.strip() for text in recognize_canvas(backend, [crops[i][1] for i in group])]
+            except Exception as e:
+                print(f"    Error processing a region in {filename}: {e}")
+                recognized = ["[OCR_ERROR]"] * len(group)
+            ocr_times[index] += time.perf_counter() - start
+            for i, text in zip(group, recognized):
+                texts[index][crops[i][0]] = text
+
+    # Charge each configuration the full cost of the intermediates it used, i.e.
+    # what it would have cost on its own, so the timings are comparable.
+    for index, config in enumerate(configs):
+        deskew, steps = config['apply_deskew'], pipelines[index].steps
+        used = [('decode',)] + [(deskew, steps[:length]) for length in range(len(steps) + 1)]
+        if deskew:
+            used.append(('deskew',))
+        preprocess_times[index] = sum(step_times.get(key, 0.0) for key in used)
+
+    return texts, ocr_times, preprocess_times
+
+
+def run_parameter_sweep(image_dir, ground_truth_data, configs, lang='eng', backend='auto', workers=1,
+                        preprocessing_order=DEFAULT_ORDER, grayscale_first=False,
+                        confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """
+    Evaluates several Tesseract/pre-processing configurations in a single pass
+    over the dataset and returns one comparison table with the aggregate WER/CER
+    and the time per configuration.
+
+    `ground_truth_data` is a dataset.CompactDataset or the dict returned by
+    parse_label_studio_export. `configs` is a list of dicts with the keys psm, oem, apply_rescaling,
+    apply_binarization, apply_deskew and ocr_mode (see expand_grid); a missing
+    ocr_mode means 'per_crop'. The enabled pre-processing steps run in
+    `preprocessing_order`, with `grayscale_first` as in
+    run_ocr.iter_ocr_results, and adaptive configurations accept a path at
+    `confidence_threshold`, so each row matches a main.py run with the same
+    settings. Each image is decoded once and the shared pre-processing
+    intermediates are computed once; only the OCR call is repeated per
+    configuration.
+    """
+    print(f"--- Running parameter sweep over {len(configs)} configurations ---")
+    backend = resolve_backend_name(backend)
+    configs = [dict({'ocr_mode': 'per_crop'}, **config) for config in configs]
+    pipelines = [PreprocessingPipeline.from_flags(config['apply_rescaling'], config['apply_binarization'],
+                                                  order=preprocessing_order, grayscale_first=grayscale_first)
+                 for config in configs]
+    if not workers:
+        workers = os.cpu_count() or 1
+
+    if not isinstance(ground_truth_data, CompactDataset):
+        ground_truth_data = CompactDataset.from_records(
+            (filename, data.get('boxes', [])) for filename, data in ground_truth_data.items())
+
+    tasks = []
+    for image in ground_truth_data:
+        image_path = os.path.join(image_dir, image.filename)
+        if not os.path.exists(image_path):
+            print(f"  [Warning] Image file not found, skipping: {image_path}")
+            continue
+        tasks.append((image, (image_path, image.filename, image.coords, configs, pipelines, confidence_threshold,
+                              lang, backend)))
+
+    # OCR texts per configuration: filename -> TextColumn, in box order.
+    texts_per_config = [{} for _ in configs]
+    ocr_totals = [0.0] * len(configs)
+    preprocess_totals = [0.0] * len(configs)
+
+    sweep_start = time.perf_counter()
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_sweep_image_task, [task for _, task in tasks])
+    else:
+        executor = None
+        results = map(_sweep_image_task, [task for _, task in tasks])
+
+    try:
+        for (image, _), result in zip(tasks, results):
+            print(f"  Processed {image.filename}")
+            if result is None:
+                continue
+            texts, ocr_times, preprocess_times = result
+            for index in range(len(configs)):
+                texts_per_config[index][image.filename] = TextColumn(texts[index])
+                ocr_totals[index] += ocr_times[index]
+                preprocess_totals[index] += preprocess_times[index]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    sweep_time = time.perf_counter() - sweep_start
+
+    rows = []
+    for index, config in enumerate(configs):
+        # Box dicts are only built for one configuration at a time.
+        processed = {}
+        for image, _ in tasks:
+            if image.filename not in texts_per_config[index]:
+                continue
+            boxes = image.to_boxes()
+            for box_info, text in zip(boxes, texts_per_config[index][image.filename]):
+                box_info['ocr_text'] = text
+            processed[image.filename] = {'boxes': boxes}
+        evaluation_df = evaluate_tesseract_performance(processed, include_box_metrics=False)
+        if evaluation_df.empty:
+            continue
+        aggregate = evaluation_df.iloc[-1]
+        rows.append({
+            'PSM': config['psm'],
+            'OEM': config['oem'],
+            'Rescaling': config['apply_rescaling'],
+            'Binarization': config['apply_binarization'],
+            'Deskew': config['apply_deskew'],
+            'Mode': config['ocr_mode'],
+            'WER (%)': aggregate['WER (%)'],
+            'CER (%)': aggregate['CER (%)'],
+            'Preprocess Time (s)': preprocess_totals[index],
+            'OCR Time (s)': ocr_totals[index],
+            'Total Time (s)': preprocess_totals[index] + ocr_totals[index],
+        })
+
+    print(f"\n--- Sweep complete in {sweep_time:.1f}s for {len(configs)} configurations. ---")
+    return pd.DataFrame(rows)
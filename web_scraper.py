@@ -1,74 +1,236 @@
+import argparse
+import json
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 import time
 
-def scrape_all_book_covers(base_url, save_directory):
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+MANIFEST_FILENAME = 'manifest.json'
+
+
+class RateLimiter:
+    """
+    Spaces requests from all threads at least 1/requests_per_second apart.
+    A rate of 0 or None disables the limit.
+    """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size=8, headers=None):
+    """Returns a requests session whose connection pool can serve `pool_size` threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers or DEFAULT_HEADERS)
+    return session
+
+
+def load_manifest(save_directory):
+    """Returns the {filename: entry} manifest of a previous run, or an empty dict."""
+    manifest_path = os.path.join(save_directory, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return {entry['filename']: entry for entry in json.load(f)['files']}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        return {}
+
+
+def save_manifest(save_directory, entries):
+    """Writes the manifest atomically so an interrupted run never leaves a truncated file."""
+    manifest_path = os.path.join(save_directory, MANIFEST_FILENAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'updated_at': time.time(),
+                   'files': sorted(entries.values(), key=lambda entry: entry['filename'])}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def scrape_all_book_covers(base_url, save_directory, workers=8, requests_per_second=4.0, force=False):
     """
     Scrapes all book cover images from books.toscrape.com by navigating
     through the catalogue pages.
 
+    Catalogue pages are walked in order while the book pages and images are
+    fetched by `workers` threads sharing one pooled session. Every request,
+    from any thread, goes through a global rate limit of `requests_per_second`.
+    Images already on disk are skipped when the server reports the same ETag
+    or size, partial downloads are resumed, and a manifest of every image is
+    written to `<save_directory>/manifest.json`.
+
     Args:
         base_url (str): The starting URL of the website's catalogue.
         save_directory (str): The local directory to save the images.
+        workers (int): Number of concurrent download threads.
+        requests_per_second (float): Global request rate limit (0 disables it).
+        force (bool): Download every image again, ignoring files on disk.
+
+    Returns:
+        dict: The manifest entries of this run, keyed by filename.
     """
     if not os.path.exists(save_directory):
         os.makedirs(save_directory)
 
+    previous_manifest = {} if force else load_manifest(save_directory)
+    session = make_session(pool_size=workers)
+    rate_limiter = RateLimiter(requests_per_second)
+    manifest = {}
+    manifest_lock = threading.Lock()
+    counts = {'downloaded': 0, 'resumed': 0, 'unchanged': 0, 'failed': 0}
+
+    def download_book(book_url):
+        entry = download_full_size_image(book_url, save_directory, session=session,
+                                         rate_limiter=rate_limiter, manifest=previous_manifest,
+                                         force=force)
+        with manifest_lock:
+            if entry is None:
+                counts['failed'] += 1
+            else:
+                counts[entry['status']] += 1
+                manifest[entry['filename']] = entry
+
     current_page_url = base_url
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    while current_page_url:
-        print(f"\n--- Scraping Catalogue Page: {current_page_url} ---")
-        
-        try:
-            # 1. Fetch the catalogue page
-            page_response = requests.get(current_page_url, headers=headers)
-            page_response.raise_for_status()
-            soup = BeautifulSoup(page_response.content, 'html.parser')
-
-            # 2. Find all links to individual book pages
-            # The links are within the <h3> tag of each <article class="product_pod">
-            book_articles = soup.find_all('article', class_='product_pod')
-            if not book_articles:
-                print("No book articles found on this page.")
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while current_page_url:
+            print(f"\n--- Scraping Catalogue Page: {current_page_url} ---")
+
+            try:
+                # 1. Fetch the catalogue page
+                rate_limiter.wait()
+                page_response = session.get(current_page_url)
+                page_response.raise_for_status()
+                soup = BeautifulSoup(page_response.content, 'html.parser')
+
+                # 2. Find all links to individual book pages
+                # The links are within the <h3> tag of each <article class="product_pod">
+                book_articles = soup.find_all('article', class_='product_pod')
+                if not book_articles:
+                    print("No book articles found on this page.")
+                    break
+
+                # 3. Hand the book pages to the download threads; the full-size
+                # image is found on each book's page.
+                for article in book_articles:
+                    book_relative_url = article.find('h3').find('a')['href']
+                    executor.submit(download_book, urljoin(current_page_url, book_relative_url))
+
+                # 4. Find the "next" button to go to the next catalogue page
+                next_button = soup.find('li', class_='next')
+                if next_button and next_button.find('a'):
+                    next_page_relative_url = next_button.find('a')['href']
+                    current_page_url = urljoin(current_page_url, next_page_relative_url)
+                else:
+                    print("\n--- No more pages found. Waiting for the remaining downloads. ---")
+                    current_page_url = None
+
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching page {current_page_url}: {e}")
                 break
+    finally:
+        executor.shutdown(wait=True)
+        session.close()
+        # Keep entries from earlier runs that were not seen this time (e.g. a
+        # run limited to one category) so the manifest describes the directory.
+        save_manifest(save_directory, dict(previous_manifest, **manifest))
 
-            for article in book_articles:
-                # Get the relative URL of the book's page
-                book_relative_url = article.find('h3').find('a')['href']
-                # Construct the absolute URL for the book's page
-                book_absolute_url = urljoin(current_page_url, book_relative_url)
-                
-                # 3. Go to the book's page to find the full-size image
-                download_full_size_image(book_absolute_url, save_directory, headers)
-                
-                # Implement rate limiting between requests
-                time.sleep(1)
-
-            # 4. Find the "next" button to go to the next catalogue page
-            next_button = soup.find('li', class_='next')
-            if next_button and next_button.find('a'):
-                next_page_relative_url = next_button.find('a')['href']
-                current_page_url = urljoin(current_page_url, next_page_relative_url)
-            else:
-                print("\n--- No more pages found. Scraping complete. ---")
-                current_page_url = None
+    elapsed = time.perf_counter() - start
+    print(f"\n--- Scraping complete in {elapsed:.1f}s: {counts['downloaded']} downloaded, "
+          f"{counts['resumed']} resumed, {counts['unchanged']} unchanged, {counts['failed']} failed. ---")
+    return manifest
+
+
+def _fetch_image(img_url, save_path, session, rate_limiter, known_entry, force=False):
+    """
+    Downloads `img_url` to `save_path`, skipping or resuming where possible.
+    Returns (status, etag, size) where status is 'unchanged', 'resumed' or
+    'downloaded'.
+
+    The image is written to `<save_path>.part` and renamed when complete. The
+    ETag of an in-progress download is kept in `<save_path>.part.etag`, so an
+    interrupted download can be resumed with a Range request as long as the
+    server still has the same version.
+    """
+    part_path = save_path + '.part'
+    etag_path = part_path + '.etag'
+    request_headers = {}
+
+    if os.path.exists(save_path) and not force:
+        local_size = os.path.getsize(save_path)
+        if known_entry and known_entry.get('etag'):
+            # Conditional GET: the server answers 304 if the image has not changed.
+            request_headers['If-None-Match'] = known_entry['etag']
+        else:
+            rate_limiter.wait()
+            head = session.head(img_url, allow_redirects=True)
+            head.raise_for_status()
+            if head.headers.get('Content-Length') == str(local_size):
+                return 'unchanged', head.headers.get('ETag'), local_size
+    elif os.path.exists(part_path) and os.path.exists(etag_path):
+        with open(etag_path, 'r', encoding='utf-8') as f:
+            partial_etag = f.read().strip()
+        if partial_etag:
+            request_headers['Range'] = f"bytes={os.path.getsize(part_path)}-"
+            request_headers['If-Range'] = partial_etag
+
+    rate_limiter.wait()
+    with session.get(img_url, stream=True, headers=request_headers) as img_response:
+        if img_response.status_code == 304:
+            return 'unchanged', known_entry['etag'], os.path.getsize(save_path)
+        img_response.raise_for_status()
+
+        # A 200 answer to a Range request means the image changed; start over.
+        resumed = img_response.status_code == 206
+        etag = img_response.headers.get('ETag')
+        with open(etag_path, 'w', encoding='utf-8') as f:
+            f.write(etag or '')
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in img_response.iter_content(64 * 1024):
+                f.write(chunk)
+
+    os.replace(part_path, save_path)
+    os.remove(etag_path)
+    return ('resumed' if resumed else 'downloaded'), etag, os.path.getsize(save_path)
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching page {current_page_url}: {e}")
-            break
 
-def download_full_size_image(book_page_url, save_directory, headers):
+def download_full_size_image(book_page_url, save_directory, headers=None, session=None,
+                             rate_limiter=None, manifest=None, force=False):
     """
     Visits a single book's page, finds the full-size image URL, and downloads it.
+    Returns the image's manifest entry, or None if it could not be fetched.
+
+    `manifest` holds the entries of a previous run; an image already on disk is
+    only downloaded again if the server reports a different ETag or size.
     """
+    session = session or make_session(pool_size=1, headers=headers)
+    rate_limiter = rate_limiter or RateLimiter(None)
+    manifest = manifest or {}
     try:
         # Visit the book's dedicated page
-        book_response = requests.get(book_page_url, headers=headers)
+        rate_limiter.wait()
+        book_response = session.get(book_page_url)
         book_response.raise_for_status()
         book_soup = BeautifulSoup(book_response.content, 'html.parser')
 
@@ -77,27 +239,34 @@ def download_full_size_image(book_page_url, save_directory, headers):
         image_container = book_soup.find('div', class_='item active')
         if not image_container or not image_container.find('img'):
             print(f"Warning: Could not find image container on {book_page_url}")
-            return
-            
+            return None
+
         img_relative_url = image_container.find('img')['src']
-        
+
         # Construct the absolute URL for the image
         img_absolute_url = urljoin(book_page_url, img_relative_url)
 
-        # Get the image content
-        img_response = requests.get(img_absolute_url, stream=True, headers=headers)
-        img_response.raise_for_status()
-
         # Extract filename and create a valid local path
         img_filename = os.path.basename(img_absolute_url)
         save_path = os.path.join(save_directory, img_filename)
 
-        # Save the image to the local directory
-        with open(save_path, 'wb') as f:
-            for chunk in img_response.iter_content(1024):
-                f.write(chunk)
-        
-        print(f"Successfully downloaded {img_filename} from {book_page_url}")
+        known_entry = None if force else manifest.get(img_filename)
+        if known_entry and known_entry.get('url') != img_absolute_url:
+            known_entry = None
+        status, etag, size = _fetch_image(img_absolute_url, save_path, session, rate_limiter,
+                                          known_entry, force=force)
+
+        if status != 'unchanged':
+            print(f"Successfully downloaded {img_filename} from {book_page_url}")
+        return {
+            'filename': img_filename,
+            'url': img_absolute_url,
+            'book_url': book_page_url,
+            'etag': etag,
+            'size': size,
+            'status': status,
+            'fetched_at': time.time(),
+        }
 
     except requests.exceptions.RequestException as e:
         print(f"Error downloading image from {book_page_url}: {e}")
@@ -105,12 +274,21 @@ def download_full_size_image(book_page_url, save_directory, headers):
         print(f"Error saving image for {book_page_url}: {e}")
     except (TypeError, KeyError) as e:
         print(f"Error parsing HTML on {book_page_url}: {e}")
+    return None
 
 
 if __name__ == '__main__':
-    # Start at the beginning of the book catalogue
-    url_to_scrape = 'http://books.toscrape.com/catalogue/category/books_1/index.html'
-    output_directory = 'images'
-    
-    scrape_all_book_covers(url_to_scrape, output_directory)
-    print(f"\nAll book covers have been saved to '{output_directory}'.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Download book cover images for an evaluation corpus.')
+    # Start at the beginning of the book catalogue by default
+    parser.add_argument('--base-url', default='http://books.toscrape.com/catalogue/category/books_1/index.html',
+                        help='First catalogue page to scrape.')
+    parser.add_argument('--output', default='images', help='Directory to save the images to.')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent download threads.')
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help='Global limit in requests per second (0 disables it).')
+    parser.add_argument('--force', action='store_true', help='Download every image again.')
+    args = parser.parse_args()
+
+    scrape_all_book_covers(args.base_url, args.output, workers=args.workers,
+                           requests_per_second=args.rate, force=args.force)
+    print(f"\nAll book covers have been saved to '{args.output}'.")